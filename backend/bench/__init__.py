@@ -0,0 +1 @@
+"""Local load-testing tools: a fake Vertex AI server and a load driver for the API."""
@@ -0,0 +1,141 @@
+"""Measure how quickly a fresh API process becomes ready.
+
+Usage:
+    python -m backend.bench.cold_start --runs 5 --report cold_start.json
+    python -m backend.bench.cold_start --baseline cold_start.json --max-regression 0.2
+
+Each run starts a new interpreter that imports backend.main, serves it with
+uvicorn and polls /api/health until it answers. The script reports the
+import time, the time until the first healthy response and the peak RSS
+(medians across runs), and lists any SDK modules the import pulled in. It
+exits non-zero if an SDK module is imported eagerly, a --max-* limit is
+exceeded, or a metric regressed past --baseline by more than --max-regression.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must only be imported on first use (or by the background prewarm).
+LAZY_MODULES = ("vertexai", "google.cloud.aiplatform", "langchain", "langchain_core", "google.auth", "google.oauth2")
+
+METRICS = ("import_seconds", "ready_seconds", "max_rss_mb")
+
+_CHILD = r"""
+import json, resource, socket, sys, threading, time, urllib.request
+
+started = time.perf_counter()
+import backend.main
+import_seconds = time.perf_counter() - started
+loaded = sorted({name for name in sys.modules if name.split(".")[0] in ("vertexai", "langchain", "langchain_core", "google")})
+
+import uvicorn
+
+with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+server = uvicorn.Server(uvicorn.Config(backend.main.app, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while True:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+            if response.status == 200:
+                break
+    except OSError:
+        time.sleep(0.01)
+ready_seconds = time.perf_counter() - started
+server.should_exit = True
+
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "ready_seconds": ready_seconds,
+    "max_rss_mb": max_rss_mb,
+    "loaded_modules": loaded,
+}))
+"""
+
+def _child_environment(prewarm: bool) -> dict:
+    env = dict(os.environ)
+    # Without credentials the health check does not probe them, and background
+    # work is off so it cannot race the measurement.
+    env.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    env.pop("GOOGLE_APPLICATION_CREDENTIALS_JSON", None)
+    env.update({
+        "SDK_PREWARM": "true" if prewarm else "false",
+        "PARSE_CACHE_PREWARM": "false",
+        "ENGINE_POOL_SIZE": "0",
+        "KEEP_WARM_ENABLED": "false",
+        "DEPLOYMENT_STORE": "memory",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+def measure_once(prewarm: bool = False) -> dict:
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        cwd=project_root,
+        env=_child_environment(prewarm),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cold-start run failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def eager_modules(loaded: list) -> list:
+    return [name for name in loaded if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)]
+
+def summarize(runs: list) -> dict:
+    summary = {metric: statistics.median(r[metric] for r in runs) for metric in METRICS}
+    summary["eager_modules"] = sorted({name for run in runs for name in eager_modules(run["loaded_modules"])})
+    return summary
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for metric in METRICS:
+        previous = baseline.get(metric)
+        if previous and summary[metric] > previous * (1 + max_regression):
+            regressions.append(f"{metric}: {previous:.3f} -> {summary[metric]:.3f}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API import time, time to first healthy response and RSS")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start; medians are reported")
+    parser.add_argument("--prewarm", action="store_true", help="Leave SDK_PREWARM on (it only runs with credentials)")
+    parser.add_argument("--max-import-seconds", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail if the median peak RSS exceeds this")
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative regression per metric")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once(args.prewarm) for _ in range(args.runs)]
+    summary = summarize(runs)
+    print(f"import {summary['import_seconds'] * 1000:.0f}ms  ready {summary['ready_seconds'] * 1000:.0f}ms  "
+          f"rss {summary['max_rss_mb']:.0f}MB  ({args.runs} runs)")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"summary": summary, "runs": runs}, f, indent=2)
+
+    failures = [f"eagerly imported: {name}" for name in summary["eager_modules"]]
+    if args.max_import_seconds is not None and summary["import_seconds"] > args.max_import_seconds:
+        failures.append(f"import_seconds {summary['import_seconds']:.3f} > {args.max_import_seconds}")
+    if args.max_rss_mb is not None and summary["max_rss_mb"] > args.max_rss_mb:
+        failures.append(f"max_rss_mb {summary['max_rss_mb']:.0f} > {args.max_rss_mb}")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            failures.extend(compare(summary, json.load(f)["summary"], args.max_regression))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""Local stand-in for the Vertex AI endpoints this service calls.
+
+Emulates the OAuth token endpoint, generateContent/streamGenerateContent,
+reasoning-engine create/get/update/delete/query/streamQuery and cachedContents,
+with configurable latency and injected 429/503 errors. Extra latency and
+error rates can be set per location, to exercise multi-region routing.
+Standard library only.
+
+Run standalone with:
+    python -m backend.bench.fake_vertex --port 8900 --error-rate 0.05
+    python -m backend.bench.fake_vertex --region-latency us-central1=0.8,europe-west4=0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+DEFAULT_LATENCY_SECONDS = {
+    "token": 0.02,
+    "generate": 0.4,
+    "stream_chunk": 0.05,
+    "engine_create": 3.0,
+    "engine_update": 2.0,
+    "engine_admin": 0.05,
+    "engine_query": 0.6,
+    "cache_create": 0.3,
+}
+
+FAKE_AGENT_CONFIG = {
+    "agent_name": "fake_support_agent",
+    "agent_type": "task-oriented",
+    "description": "Answers questions for load testing.",
+    "capabilities": ["answer questions", "look up orders", "summarize"],
+    "tools": ["search"],
+    "personality": "Concise and friendly",
+    "instructions": "Answer briefly.",
+}
+
+_ENGINE = r"(?P<engine>projects/[^/]+/locations/[^/]+/reasoningEngines/[^/:]+)"
+_COLLECTION = r"projects/(?P<project>[^/]+)/locations/(?P<location>[^/]+)"
+_LOCATION = re.compile(r"/locations/([^/:]+)")
+
+ROUTES = [
+    ("POST", re.compile(r"^/token$"), "token"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_COLLECTION}/publishers/google/models/(?P<model>[^/:]+):generateContent$"), "generate"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_COLLECTION}/publishers/google/models/(?P<model>[^/:]+):streamGenerateContent$"), "stream_generate"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_COLLECTION}/reasoningEngines$"), "engine_create"),
+    ("GET", re.compile(rf"^/v1[a-z0-9]*/{_COLLECTION}/reasoningEngines$"), "engine_list"),
+    ("GET", re.compile(rf"^/v1[a-z0-9]*/{_ENGINE}$"), "engine_get"),
+    ("PATCH", re.compile(rf"^/v1[a-z0-9]*/{_ENGINE}$"), "engine_update"),
+    ("DELETE", re.compile(rf"^/v1[a-z0-9]*/{_ENGINE}$"), "engine_delete"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_ENGINE}:query$"), "engine_query"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_ENGINE}:streamQuery$"), "engine_stream_query"),
+    ("POST", re.compile(rf"^/v1[a-z0-9]*/{_COLLECTION}/cachedContents$"), "cache_create"),
+    ("DELETE", re.compile(r"^/v1[a-z0-9]*/(?P<cache>projects/[^/]+/locations/[^/]+/cachedContents/[^/]+)$"), "cache_delete"),
+    ("GET", re.compile(r"^/stats$"), "stats"),
+]
+
+def _token_count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _prompt_text(body: dict) -> str:
+    parts = []
+    for content in body.get("contents", []):
+        parts.extend(part.get("text", "") for part in content.get("parts", []))
+    return "\n".join(parts)
+
+class FakeVertex:
+    """State and behaviour of the fake service, independent of the HTTP plumbing."""
+
+    def __init__(self, latency_scale: float = 1.0, jitter: float = 0.2, error_rate: float = 0.0,
+                 error_statuses=(429, 503), latency_seconds: dict = None, seed: int = None,
+                 region_latency_seconds: dict = None, region_error_rates: dict = None):
+        self.latency_seconds = dict(DEFAULT_LATENCY_SECONDS, **(latency_seconds or {}))
+        self.region_latency_seconds = dict(region_latency_seconds or {})
+        self.region_error_rates = dict(region_error_rates or {})
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.engines = {}
+        self.caches = {}
+        self.requests = {}
+        self.region_requests = {}
+
+    def delay(self, operation: str):
+        base = self.latency_seconds.get(operation, 0.0) * self.latency_scale
+        if base <= 0:
+            return
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(base * factor)
+
+    def region_delay(self, location: str):
+        base = self.region_latency_seconds.get(location, 0.0)
+        if base > 0:
+            time.sleep(base)
+
+    def injected_error(self, operation: str, location: str = None):
+        error_rate = self.region_error_rates.get(location, self.error_rate)
+        if operation in ("token", "stats") or error_rate <= 0:
+            return None
+        with self._lock:
+            if self._random.random() >= error_rate:
+                return None
+            return self._random.choice(self.error_statuses)
+
+    def count(self, operation: str, status: int):
+        with self._lock:
+            counts = self.requests.setdefault(operation, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def answer(self, prompt: str) -> str:
+        if "configuration parser" in prompt:
+            return json.dumps(FAKE_AGENT_CONFIG)
+        return f"Fake reply to: {prompt[-200:]}"
+
+    def generate(self, body: dict) -> dict:
+        prompt = _prompt_text(body)
+        text = self.answer(prompt)
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            cached_tokens = self.caches.get(body["cachedContent"], 0)
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {
+                "promptTokenCount": _token_count(prompt) + cached_tokens,
+                "candidatesTokenCount": _token_count(text),
+                "cachedContentTokenCount": cached_tokens,
+            },
+        }
+
+    def create_engine(self, project: str, location: str, body: dict) -> dict:
+        with self._lock:
+            name = f"projects/{project}/locations/{location}/reasoningEngines/{next(self._ids)}"
+            self.engines[name] = {"name": name, "displayName": body.get("displayName", ""), "spec": body.get("spec", {})}
+            return dict(self.engines[name])
+
+    def create_cache(self, project: str, location: str, body: dict) -> dict:
+        instruction = _prompt_text({"contents": [body.get("systemInstruction", {})]})
+        with self._lock:
+            name = f"projects/{project}/locations/{location}/cachedContents/{next(self._ids)}"
+            self.caches[name] = _token_count(instruction)
+        return {"name": name, "model": body.get("model")}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": json.loads(json.dumps(self.requests)), "regions": dict(self.region_requests),
+                    "engines": len(self.engines), "caches": len(self.caches)}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, data: dict, operation: str):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+        self.fake.count(operation, status)
+
+    def _start_stream(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self, operation: str):
+        self.wfile.write(b"0\r\n\r\n")
+        self.fake.count(operation, 200)
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return {}
+        return json.loads(raw)
+
+    def _dispatch(self, method: str):
+        path = urlparse(self.path).path
+        for route_method, pattern, operation in ROUTES:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                break
+        else:
+            self._read_body()
+            self._send_json(404, {"error": {"code": 404, "message": f"No fake for {method} {path}"}}, "unknown")
+            return
+
+        body = self._read_body()
+        location_match = _LOCATION.search(path)
+        location = location_match.group(1) if location_match else None
+        if location is not None:
+            with self.fake._lock:
+                self.fake.region_requests[location] = self.fake.region_requests.get(location, 0) + 1
+            self.fake.region_delay(location)
+        status = self.fake.injected_error(operation, location)
+        if status is not None:
+            self.fake.delay("engine_admin")
+            self._send_json(status, {"error": {"code": status, "message": "Injected error"}}, operation)
+            return
+        getattr(self, f"_handle_{operation}")(match, body, operation)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _handle_stats(self, match, body, operation):
+        self._send_json(200, self.fake.stats(), operation)
+
+    def _handle_token(self, match, body, operation):
+        self.fake.delay("token")
+        self._send_json(200, {"access_token": f"fake-token-{time.time():.0f}", "expires_in": 3600,
+                              "token_type": "Bearer"}, operation)
+
+    def _handle_generate(self, match, body, operation):
+        self.fake.delay("generate")
+        self._send_json(200, self.fake.generate(body), operation)
+
+    def _handle_stream_generate(self, match, body, operation):
+        response = self.fake.generate(body)
+        words = response["candidates"][0]["content"]["parts"][0]["text"].split(" ")
+        self.fake.delay("generate")
+        self._start_stream("text/event-stream")
+        for index in range(0, len(words), 8):
+            chunk = dict(response, candidates=[{"content": {"role": "model", "parts": [{"text": " ".join(words[index:index + 8]) + " "}]}}])
+            self._write_chunk(f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8"))
+            self.fake.delay("stream_chunk")
+        self._end_stream(operation)
+
+    def _handle_engine_create(self, match, body, operation):
+        self.fake.delay("engine_create")
+        engine = self.fake.create_engine(match["project"], match["location"], body)
+        self._send_json(200, engine, operation)
+
+    def _handle_engine_list(self, match, body, operation):
+        self.fake.delay("engine_admin")
+        self._send_json(200, {"reasoningEngines": list(self.fake.engines.values())}, operation)
+
+    def _handle_engine_get(self, match, body, operation):
+        self.fake.delay("engine_admin")
+        engine = self.fake.engines.get(match["engine"])
+        if engine is None:
+            self._send_json(404, {"error": {"code": 404, "message": "Engine not found"}}, operation)
+        else:
+            self._send_json(200, engine, operation)
+
+    def _handle_engine_update(self, match, body, operation):
+        self.fake.delay("engine_update")
+        engine = self.fake.engines.get(match["engine"])
+        if engine is None:
+            self._send_json(404, {"error": {"code": 404, "message": "Engine not found"}}, operation)
+            return
+        engine.update({k: v for k, v in body.items() if k in ("displayName", "spec")})
+        self._send_json(200, engine, operation)
+
+    def _handle_engine_delete(self, match, body, operation):
+        self.fake.delay("engine_admin")
+        self.fake.engines.pop(match["engine"], None)
+        self._send_json(200, {}, operation)
+
+    def _handle_engine_query(self, match, body, operation):
+        if match["engine"] not in self.fake.engines:
+            self._send_json(404, {"error": {"code": 404, "message": "Engine not found"}}, operation)
+            return
+        self.fake.delay("engine_query")
+        text = self.fake.answer(str(body.get("input", {}).get("input", "")))
+        self._send_json(200, {"output": {"input": body.get("input", {}).get("input"), "output": text}}, operation)
+
+    def _handle_engine_stream_query(self, match, body, operation):
+        if match["engine"] not in self.fake.engines:
+            self._send_json(404, {"error": {"code": 404, "message": "Engine not found"}}, operation)
+            return
+        text = self.fake.answer(str(body.get("input", {}).get("input", "")))
+        self.fake.delay("engine_query")
+        self._start_stream("application/json")
+        words = text.split(" ")
+        for index in range(0, len(words), 8):
+            self._write_chunk((json.dumps({"output": " ".join(words[index:index + 8]) + " "}) + "\n").encode("utf-8"))
+            self.fake.delay("stream_chunk")
+        self._end_stream(operation)
+
+    def _handle_cache_create(self, match, body, operation):
+        self.fake.delay("cache_create")
+        self._send_json(200, self.fake.create_cache(match["project"], match["location"], body), operation)
+
+    def _handle_cache_delete(self, match, body, operation):
+        self.fake.caches.pop(match["cache"], None)
+        self._send_json(200, {}, operation)
+
+class FakeVertexServer:
+    """Runs a FakeVertex on a background ThreadingHTTPServer."""
+
+    def __init__(self, fake: FakeVertex = None, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake or FakeVertex()
+        handler = type("FakeVertexHandler", (_Handler,), {"fake": self.fake})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-vertex", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def parse_region_values(text: str) -> dict:
+    """Parse "location=value,location=value" into {location: float}."""
+    values = {}
+    for item in text.split(","):
+        if item.strip():
+            location, _, value = item.partition("=")
+            values[location.strip()] = float(value)
+    return values
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Vertex AI API for local load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every emulated latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 429/503")
+    parser.add_argument("--region-latency", type=parse_region_values, default={},
+                        help="Extra seconds per location, e.g. us-central1=0.8,europe-west4=0.05")
+    parser.add_argument("--region-error-rate", type=parse_region_values, default={},
+                        help="Per-location override of --error-rate, e.g. us-central1=0.5")
+    args = parser.parse_args(argv)
+
+    fake = FakeVertex(latency_scale=args.latency_scale, error_rate=args.error_rate,
+                      region_latency_seconds=args.region_latency, region_error_rates=args.region_error_rate)
+    server = FakeVertexServer(fake, host=args.host, port=args.port)
+    print(f"Fake Vertex AI listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
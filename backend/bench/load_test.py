@@ -0,0 +1,341 @@
+"""Drive concurrent load at the API against the local fake Vertex AI server.
+
+Usage:
+    python -m backend.bench.load_test --requests 200 --concurrency 16 --report bench.json
+    python -m backend.bench.load_test --baseline bench.json --max-regression 0.2
+    python -m backend.bench.load_test --scenarios test --locations us-central1,europe-west4 \
+        --region-latency us-central1=0.8
+
+Boots backend.main's app with uvicorn on a free port. Every Vertex call goes
+to the fake server, and the script reports p50/p95/p99 latency and
+throughput per scenario. With --baseline it exits non-zero when any
+scenario's p95 grew, or its throughput dropped, by more than --max-regression.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.bench.fake_vertex import FakeVertex, FakeVertexServer, parse_region_values
+
+SCENARIOS = ("parse", "deploy", "test")
+TERMINAL_STATUSES = ("completed", "error", "cancelled")
+DEPLOY_TIMEOUT_SECONDS = 600
+
+def _fake_service_account(token_uri: str, project_id: str) -> str:
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private_key = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode("ascii")
+    except ImportError:
+        import rsa
+
+        _, key = rsa.newkeys(2048)
+        private_key = key.save_pkcs1().decode("ascii")
+    return json.dumps({
+        "type": "service_account",
+        "project_id": project_id,
+        "private_key_id": "bench",
+        "private_key": private_key,
+        "client_email": f"bench@{project_id}.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": token_uri,
+    })
+
+def _configure_environment(base_url: str, project_id: str, locations: list = None):
+    os.environ["VERTEX_API_BASE_URL"] = base_url
+    os.environ["VERTEX_AI_PROJECT_ID"] = project_id
+    if locations:
+        os.environ["VERTEX_AI_LOCATION"] = locations[0]
+        os.environ["VERTEX_AI_LOCATIONS"] = ",".join(locations)
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS_JSON"] = _fake_service_account(f"{base_url}/token", project_id)
+    os.environ.pop("GOOGLE_APPLICATION_CREDENTIALS", None)
+    # Background work would add noise to the measurements.
+    for name, value in {
+        "PARSE_CACHE_PREWARM": "false",
+        "ENGINE_POOL_SIZE": "0",
+        "KEEP_WARM_ENABLED": "false",
+        "DEPLOYMENT_STORE": "memory",
+    }.items():
+        os.environ.setdefault(name, value)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _start_app():
+    import uvicorn
+    from backend.bench import sdk_shim
+
+    sdk_shim.install()
+    from backend.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=_free_port(), log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-api", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("API server failed to start")
+        time.sleep(0.05)
+    host, port = server.config.host, server.config.port
+    return server, thread, f"http://{host}:{port}"
+
+def percentile(sorted_values: list, p: float):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Recorder:
+    """Collects latencies and errors per named series from many threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+
+    def record(self, series: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(series, []).append(seconds)
+
+    def error(self, series: str, reason: str):
+        with self._lock:
+            errors = self._errors.setdefault(series, {})
+            errors[reason] = errors.get(reason, 0) + 1
+
+    def summary(self, wall_seconds: float) -> dict:
+        with self._lock:
+            names = sorted(set(self._latencies) | set(self._errors))
+            result = {}
+            for name in names:
+                values = sorted(self._latencies.get(name, []))
+                errors = self._errors.get(name, {})
+                result[name] = {
+                    "count": len(values),
+                    "errors": sum(errors.values()),
+                    "error_reasons": dict(errors),
+                    "rps": len(values) / wall_seconds if wall_seconds > 0 else 0.0,
+                    "p50_ms": _ms(percentile(values, 50)),
+                    "p95_ms": _ms(percentile(values, 95)),
+                    "p99_ms": _ms(percentile(values, 99)),
+                    "max_ms": _ms(values[-1] if values else None),
+                }
+            return result
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+class LoadClient:
+    def __init__(self, base_url: str, concurrency: int):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url
+        self._local = threading.local()
+        self._requests = requests
+        self._adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+            session.mount("http://", self._adapter)
+        return session
+
+    def call(self, recorder: Recorder, series: str, method: str, path: str, payload: dict = None):
+        """Make one timed request; returns the JSON body, or None after recording an error."""
+        started = time.perf_counter()
+        try:
+            response = self._session().request(method, f"{self.base_url}{path}", json=payload, timeout=300)
+        except Exception as e:
+            recorder.error(series, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            recorder.error(series, f"HTTP {response.status_code}")
+            return None
+        recorder.record(series, elapsed)
+        return response.json()
+
+def _agent_config(name: str) -> dict:
+    return {
+        "agent_name": name,
+        "agent_type": "task-oriented",
+        "description": "Load-test agent",
+        "capabilities": ["answer questions"],
+        "tools": ["search"],
+        "personality": "Concise",
+        "instructions": "Answer briefly.",
+    }
+
+def _deploy_and_wait(client: LoadClient, recorder: Recorder, name: str, poll_seconds: float):
+    started = time.perf_counter()
+    body = client.call(recorder, "deploy_submit", "POST", "/api/deploy", {"config": _agent_config(name)})
+    if body is None:
+        recorder.error("deploy_e2e", "submit failed")
+        return None
+    deployment_id = body["deployment_id"]
+    while True:
+        status = client.call(recorder, "status", "GET", f"/api/status/{deployment_id}")
+        if status is not None and status["status"] in TERMINAL_STATUSES:
+            break
+        if time.perf_counter() - started > DEPLOY_TIMEOUT_SECONDS:
+            recorder.error("deploy_e2e", "timeout")
+            return None
+        time.sleep(poll_seconds)
+    if status["status"] != "completed":
+        recorder.error("deploy_e2e", status["status"])
+        return None
+    recorder.record("deploy_e2e", time.perf_counter() - started)
+    return deployment_id
+
+def _run(total: int, concurrency: int, func) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-load") as pool:
+        list(pool.map(func, range(total)))
+    return time.perf_counter() - started
+
+def run_scenarios(client: LoadClient, args) -> dict:
+    run = uuid.uuid4().hex[:8]
+    results = {}
+
+    if "parse" in args.scenarios:
+        from backend.config import SAMPLE_PROMPTS
+
+        def parse(i):
+            prompt = SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)]
+            if not args.repeat:
+                prompt = f"{prompt} (load test {run}-{i})"
+            client.call(recorder, "parse", "POST", "/api/parse", {"user_request": prompt})
+
+        recorder = Recorder()
+        results.update(recorder.summary(_run(args.requests, args.concurrency, parse)))
+
+    if "deploy" in args.scenarios:
+        def deploy(i):
+            name = f"bench_agent_{run}" if args.repeat else f"bench_agent_{run}_{i}"
+            _deploy_and_wait(client, recorder, name, args.poll_seconds)
+
+        recorder = Recorder()
+        results.update(recorder.summary(_run(args.deploys, args.concurrency, deploy)))
+
+    if "test" in args.scenarios:
+        deployment_id = _deploy_and_wait(client, Recorder(), f"bench_test_agent_{run}", args.poll_seconds)
+        if deployment_id is None:
+            raise RuntimeError("Could not deploy the agent used by the test scenario")
+
+        def test(i):
+            query = "What can you do?" if args.repeat else f"Question {i}: what can you do?"
+            client.call(recorder, "test", "POST", "/api/test", {"deployment_id": deployment_id, "query": query})
+
+        recorder = Recorder()
+        results.update(recorder.summary(_run(args.requests, args.concurrency, test)))
+
+    return results
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not current["count"] or not previous.get("count"):
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.0f}ms -> {current['p95_ms']:.0f}ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: rps {previous['rps']:.1f} -> {current['rps']:.1f}")
+    return regressions
+
+def _format_table(results: dict) -> str:
+    def cell(value, fmt):
+        return "-" if value is None else format(value, fmt)
+
+    lines = [f"{'series':<14}{'count':>7}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, stats in results.items():
+        lines.append(
+            f"{name:<14}{stats['count']:>7}{stats['errors']:>8}{stats['rps']:>9.1f}"
+            f"{cell(stats['p50_ms'], '.0f'):>10}{cell(stats['p95_ms'], '.0f'):>10}{cell(stats['p99_ms'], '.0f'):>10}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the API against a local fake Vertex AI server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of parse,deploy,test")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per parse/test scenario")
+    parser.add_argument("--deploys", type=int, default=20, help="Deployments in the deploy scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--repeat", action="store_true", help="Reuse one prompt/config/query to exercise caches and dedupe")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply the fake server's emulated latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake Vertex calls that return 429/503")
+    parser.add_argument("--poll-seconds", type=float, default=0.2, help="Status polling interval for deployments")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency jitter and error injection")
+    parser.add_argument("--locations", help="Comma-separated Vertex AI locations to route across; the first is the deploy location")
+    parser.add_argument("--region-latency", type=parse_region_values, default={},
+                        help="Extra fake latency per location, e.g. us-central1=0.8,europe-west4=0.05")
+    parser.add_argument("--region-error-rate", type=parse_region_values, default={},
+                        help="Per-location override of --error-rate, e.g. us-central1=0.5")
+    parser.add_argument("--report", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95/rps regression")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    locations = [name.strip() for name in (args.locations or "").split(",") if name.strip()]
+    fake = FakeVertex(latency_scale=args.latency_scale, error_rate=args.error_rate, seed=args.seed,
+                      region_latency_seconds=args.region_latency, region_error_rates=args.region_error_rate)
+    fake_server = FakeVertexServer(fake).start()
+    _configure_environment(fake_server.base_url, "bench-project", locations)
+    api_server, api_thread, api_url = _start_app()
+
+    try:
+        results = run_scenarios(LoadClient(api_url, args.concurrency), args)
+    finally:
+        api_server.should_exit = True
+        api_thread.join(timeout=10)
+        fake_server.stop()
+
+    report = {
+        "settings": {name: value for name, value in vars(args).items() if name not in ("report", "baseline")},
+        "results": results,
+        "upstream_requests": fake.stats()["requests"],
+        "upstream_regions": fake.stats()["regions"],
+    }
+    print(_format_table(results))
+    print("Upstream calls: " + ", ".join(
+        f"{operation}={sum(counts.values())}" for operation, counts in sorted(report["upstream_requests"].items())
+    ))
+    if len(locations) > 1:
+        print("Upstream calls by region: " + ", ".join(
+            f"{location}={calls}" for location, calls in sorted(report["upstream_regions"].items())
+        ))
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f)["results"], args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""HTTP-backed replacements for the Vertex AI SDK classes the backend uses.
+
+The real SDK talks gRPC to Google and uploads agents to Cloud Storage, neither
+of which a local fake can serve. install() swaps the SDK classes for thin
+clients that speak plain REST to VERTEX_API_BASE_URL, so every other layer
+(auth, rate limiting, caching, retries, the REST fallback) runs unmodified.
+"""
+import json
+from types import SimpleNamespace
+
+from backend.config import get_project_config, vertex_api_base_url, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+from backend.services.auth import get_access_token
+from backend.services.http import get_session
+
+class ApiError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+def _collection() -> str:
+    project_config = get_project_config()
+    return f"projects/{project_config['project_id']}/locations/{project_config['location']}"
+
+def _request(method: str, path: str, payload: dict = None, version: str = "v1beta1", stream: bool = False):
+    url = f"{vertex_api_base_url(get_project_config()['location'])}/{version}/{path}"
+    response = get_session().request(
+        method,
+        url,
+        headers={"Authorization": f"Bearer {get_access_token()}"},
+        json=payload,
+        stream=stream,
+        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+    if response.status_code >= 400:
+        try:
+            message = response.json().get("error", {}).get("message", response.text)
+        except ValueError:
+            message = response.text
+        raise ApiError(response.status_code, message)
+    return response if stream else response.json()
+
+class LangchainAgent:
+    def __init__(self, model: str, model_kwargs: dict = None, runnable_kwargs: dict = None, **kwargs):
+        self.model = model
+        self.model_kwargs = model_kwargs or {}
+        self.system_message = (runnable_kwargs or {}).get("system_message", "")
+
+    def _spec(self) -> dict:
+        return {"model": self.model, "systemMessage": self.system_message}
+
+class ReasoningEngine:
+    def __init__(self, resource_name: str):
+        # The SDK fetches the resource on construction; so does the shim.
+        self._resource = _request("GET", resource_name)
+        self.resource_name = resource_name
+
+    @classmethod
+    def create(cls, reasoning_engine, display_name: str = None, description: str = None, requirements=None, **kwargs):
+        data = _request("POST", f"{_collection()}/reasoningEngines", {
+            "displayName": display_name,
+            "description": description,
+            "spec": reasoning_engine._spec(),
+        })
+        return cls(data["name"])
+
+    @classmethod
+    def list(cls, filter: str = None):
+        engines = _request("GET", f"{_collection()}/reasoningEngines").get("reasoningEngines", [])
+        if filter and filter.startswith("display_name="):
+            wanted = filter.split("=", 1)[1].strip('"')
+            engines = [engine for engine in engines if engine.get("displayName") == wanted]
+        return [cls(engine["name"]) for engine in engines]
+
+    def update(self, reasoning_engine=None, requirements=None, display_name: str = None, description: str = None, **kwargs):
+        payload = {"displayName": display_name, "description": description}
+        if reasoning_engine is not None:
+            payload["spec"] = reasoning_engine._spec()
+        self._resource = _request("PATCH", self.resource_name, payload)
+
+    def delete(self):
+        _request("DELETE", self.resource_name)
+
+    def query(self, **kwargs):
+        return _request("POST", f"{self.resource_name}:query", {"input": kwargs})["output"]
+
+    def stream_query(self, **kwargs):
+        with _request("POST", f"{self.resource_name}:streamQuery", {"input": kwargs}, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+class _GenerationResponse:
+    def __init__(self, data: dict):
+        candidates = data.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts") or [{}]
+        self.text = parts[0].get("text", "")
+        usage = data.get("usageMetadata", {})
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=usage.get("promptTokenCount", 0),
+            candidates_token_count=usage.get("candidatesTokenCount", 0),
+            cached_content_token_count=usage.get("cachedContentTokenCount", 0),
+        )
+
+class GenerativeModel:
+    def __init__(self, model_name: str, system_instruction: str = None, cached_content=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        return cls(cached_content.model_name, cached_content=cached_content)
+
+    def _payload(self, contents) -> dict:
+        payload = {"contents": [{"role": "user", "parts": [{"text": str(contents)}]}]}
+        if self.cached_content is not None:
+            payload["cachedContent"] = self.cached_content.resource_name
+        elif self.system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        return payload
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        # Region-pinned models are named by their full resource path.
+        path = self.model_name if "/" in self.model_name else f"{_collection()}/publishers/google/models/{self.model_name}"
+        if not stream:
+            return _GenerationResponse(_request("POST", f"{path}:generateContent", self._payload(contents), version="v1"))
+        return self._stream(f"{path}:streamGenerateContent?alt=sse", contents)
+
+    def _stream(self, path: str, contents):
+        with _request("POST", path, self._payload(contents), version="v1", stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    yield _GenerationResponse(json.loads(line[len("data:"):]))
+
+class CachedContent:
+    def __init__(self, resource_name: str, model_name: str):
+        self.resource_name = resource_name
+        self.model_name = model_name
+
+    @classmethod
+    def create(cls, model_name: str, system_instruction: str = None, ttl=None, **kwargs):
+        data = _request("POST", f"{_collection()}/cachedContents", {
+            "model": model_name,
+            "systemInstruction": {"parts": [{"text": system_instruction or ""}]},
+            "ttl": f"{int(ttl.total_seconds())}s" if ttl else None,
+        })
+        return cls(data["name"], model_name)
+
+    def delete(self):
+        _request("DELETE", self.resource_name)
+
+def install():
+    """Replace the SDK classes in place. Call before importing backend.main."""
+    from vertexai import generative_models
+    from vertexai.preview import caching, reasoning_engines
+    from vertexai.preview import generative_models as preview_generative_models
+
+    reasoning_engines.ReasoningEngine = ReasoningEngine
+    reasoning_engines.LangchainAgent = LangchainAgent
+    generative_models.GenerativeModel = GenerativeModel
+    preview_generative_models.GenerativeModel = GenerativeModel
+    caching.CachedContent = CachedContent
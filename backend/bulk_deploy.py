@@ -0,0 +1,53 @@
+"""Deploy every agent in a manifest file.
+
+Usage:
+    python -m backend.bulk_deploy agents.jsonl --parallelism 8 --checkpoint run.json --report report.json
+
+Re-running with the same --checkpoint skips agents that already deployed.
+"""
+import argparse
+import json
+import os
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-deploy agents from a JSONL/JSON/YAML manifest")
+    parser.add_argument("manifest", help="Path to a .jsonl, .json or .yaml manifest of agent configs")
+    parser.add_argument("--parallelism", type=int, default=4, help="Deployments to run at the same time")
+    parser.add_argument("--checkpoint", help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--report", help="Write the final JSON report to this path")
+    args = parser.parse_args(argv)
+
+    # The deployment scheduler reads its limits at import time.
+    os.environ.setdefault("DEPLOY_WORKERS", str(args.parallelism))
+    os.environ.setdefault("DEPLOY_PROJECT_CONCURRENCY", str(args.parallelism))
+    os.environ.setdefault("DEPLOY_QUEUE_SIZE", str(max(args.parallelism * 2, 32)))
+
+    try:
+        from backend.services.auth import has_credentials
+        from backend.services.bulk import BulkDeployment, load_manifest
+    except ImportError:
+        from services.auth import has_credentials
+        from services.bulk import BulkDeployment, load_manifest
+
+    if not has_credentials():
+        print("Google Cloud credentials not configured", file=sys.stderr)
+        return 2
+
+    configs = load_manifest(args.manifest)
+    checkpoint = args.checkpoint or f"{args.manifest}.checkpoint.json"
+    report = BulkDeployment(configs, args.parallelism, checkpoint_path=checkpoint).run()
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(report["counts"].items()))
+    print(f"Deployed {report['total']} agents in {report['elapsed_seconds']:.0f}s "
+          f"(sequential would be ~{report['sum_of_deploy_seconds']:.0f}s): {summary}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = report["counts"].get("error", 0) + report["counts"].get("cancelled", 0)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,110 @@ DEFAULT_PROJECT_ID = "vertex-ai-demo-468112"
 DEFAULT_LOCATION = "us-central1"
 STAGING_BUCKET = "gs://vertex-agent-staging"
 
+# Overrides https://{location}-aiplatform.googleapis.com for REST calls, e.g. to
+# point the service at the local fake server used by backend.bench.
+VERTEX_API_BASE_URL = os.environ.get("VERTEX_API_BASE_URL", "").rstrip("/")
+
 VERTEX_AI_SCOPES = [
     "https://www.googleapis.com/auth/cloud-platform",
     "https://www.googleapis.com/auth/aiplatform",
 ]
 
+CLOUD_PLATFORM_SCOPES = [
+    "https://www.googleapis.com/auth/cloud-platform",
+]
+
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+CREDENTIAL_PROBE_TTL_SECONDS = int(os.environ.get("CREDENTIAL_PROBE_TTL_SECONDS", "300"))
+
+STATUS_HEARTBEAT_SECONDS = float(os.environ.get("STATUS_HEARTBEAT_SECONDS", "5"))
+
+DEPLOYMENT_STORE = os.environ.get("DEPLOYMENT_STORE", "memory")
+DEPLOYMENT_STORE_PATH = os.environ.get("DEPLOYMENT_STORE_PATH", os.path.join(".data", "deployments.sqlite3"))
+DEPLOYMENT_STORE_MAX_ENTRIES = int(os.environ.get("DEPLOYMENT_STORE_MAX_ENTRIES", "1000"))
+DEPLOYMENT_TTL_SECONDS = float(os.environ.get("DEPLOYMENT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+DEPLOY_DEDUPE = os.environ.get("DEPLOY_DEDUPE", "true").lower() in ("1", "true", "yes")
+
+ENGINE_POOL_SIZE = int(os.environ.get("ENGINE_POOL_SIZE", "0"))
+ENGINE_POOL_REFILL_SECONDS = float(os.environ.get("ENGINE_POOL_REFILL_SECONDS", "60"))
+ENGINE_POOL_IDLE_SECONDS = float(os.environ.get("ENGINE_POOL_IDLE_SECONDS", "3600"))
+
+KEEP_WARM_ENABLED = os.environ.get("KEEP_WARM_ENABLED", "false").lower() in ("1", "true", "yes")
+KEEP_WARM_TICK_SECONDS = float(os.environ.get("KEEP_WARM_TICK_SECONDS", "60"))
+KEEP_WARM_INTERVAL_SECONDS = float(os.environ.get("KEEP_WARM_INTERVAL_SECONDS", "240"))
+KEEP_WARM_COLD_AFTER_SECONDS = float(os.environ.get("KEEP_WARM_COLD_AFTER_SECONDS", "600"))
+KEEP_WARM_ACTIVE_WINDOW_SECONDS = float(os.environ.get("KEEP_WARM_ACTIVE_WINDOW_SECONDS", "3600"))
+KEEP_WARM_MIN_QUERIES = int(os.environ.get("KEEP_WARM_MIN_QUERIES", "2"))
+KEEP_WARM_MAX_PER_TICK = int(os.environ.get("KEEP_WARM_MAX_PER_TICK", "10"))
+
+DEPLOY_WORKERS = int(os.environ.get("DEPLOY_WORKERS", "4"))
+DEPLOY_QUEUE_SIZE = int(os.environ.get("DEPLOY_QUEUE_SIZE", "32"))
+DEPLOY_PROJECT_CONCURRENCY = int(os.environ.get("DEPLOY_PROJECT_CONCURRENCY", "2"))
+
+BULK_CHECKPOINT_DIR = os.environ.get("BULK_CHECKPOINT_DIR", os.path.join(".data", "bulk"))
+BULK_POLL_SECONDS = float(os.environ.get("BULK_POLL_SECONDS", "2"))
+BULK_MAX_FINISHED_RUNS = int(os.environ.get("BULK_MAX_FINISHED_RUNS", "50"))
+
+CLIENT_CACHE_SIZE = int(os.environ.get("CLIENT_CACHE_SIZE", "128"))
+
+TEST_CACHE_ENABLED = os.environ.get("TEST_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+TEST_CACHE_SIZE = int(os.environ.get("TEST_CACHE_SIZE", "256"))
+TEST_CACHE_TTL_SECONDS = float(os.environ.get("TEST_CACHE_TTL_SECONDS", "300"))
+TEST_COALESCE = os.environ.get("TEST_COALESCE", "true").lower() in ("1", "true", "yes")
+
+CONTEXT_CACHE_ENABLED = os.environ.get("CONTEXT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_MODEL = os.environ.get("CONTEXT_CACHE_MODEL", "gemini-2.0-flash-001")
+CONTEXT_CACHE_TTL_SECONDS = int(os.environ.get("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+CONTEXT_CACHE_MIN_CHARS = int(os.environ.get("CONTEXT_CACHE_MIN_CHARS", "16000"))
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "32"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_SECONDS = float(os.environ.get("HTTP_BACKOFF_SECONDS", "0.5"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
+
+PARSE_CACHE_SIZE = int(os.environ.get("PARSE_CACHE_SIZE", "512"))
+PARSE_CACHE_TTL_SECONDS = float(os.environ.get("PARSE_CACHE_TTL_SECONDS", str(24 * 3600)))
+PARSE_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", "")
+PARSE_CACHE_PREWARM = os.environ.get("PARSE_CACHE_PREWARM", "true").lower() in ("1", "true", "yes")
+PARSE_RESPONSE_SCHEMA = os.environ.get("PARSE_RESPONSE_SCHEMA", "true").lower() in ("1", "true", "yes")
+PARSE_MAX_REPAIRS = int(os.environ.get("PARSE_MAX_REPAIRS", "1"))
+
+# The SDK is imported on first use; this imports it in the background after startup instead.
+SDK_PREWARM = os.environ.get("SDK_PREWARM", "true").lower() in ("1", "true", "yes")
+
+PARSE_BATCH_MAX_ITEMS = int(os.environ.get("PARSE_BATCH_MAX_ITEMS", "100"))
+PARSE_BATCH_CONCURRENCY = int(os.environ.get("PARSE_BATCH_CONCURRENCY", "8"))
+
+TEST_BATCH_MAX_ITEMS = int(os.environ.get("TEST_BATCH_MAX_ITEMS", "500"))
+TEST_BATCH_CONCURRENCY = int(os.environ.get("TEST_BATCH_CONCURRENCY", "8"))
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_PROJECT_RPM = float(os.environ.get("RATE_LIMIT_PROJECT_RPM", "600"))
+RATE_LIMIT_MODEL_RPM = float(os.environ.get("RATE_LIMIT_MODEL_RPM", "300"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.environ.get("RATE_LIMIT_MAX_CONCURRENCY", "16"))
+RATE_LIMIT_MIN_CONCURRENCY = int(os.environ.get("RATE_LIMIT_MIN_CONCURRENCY", "1"))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+
+# Parse and test traffic is routed across VERTEX_AI_LOCATIONS (the deploy
+# location always included) by rolling latency and error rate.
+REGION_WINDOW_SECONDS = float(os.environ.get("REGION_WINDOW_SECONDS", "300"))
+REGION_EJECT_AFTER_FAILURES = int(os.environ.get("REGION_EJECT_AFTER_FAILURES", "3"))
+REGION_EJECT_SECONDS = float(os.environ.get("REGION_EJECT_SECONDS", "60"))
+REGION_MAX_ATTEMPTS = int(os.environ.get("REGION_MAX_ATTEMPTS", "2"))
+REGION_PROBE_FRACTION = float(os.environ.get("REGION_PROBE_FRACTION", "0.05"))
+
+EXECUTOR_MAX_WORKERS = int(os.environ.get("EXECUTOR_MAX_WORKERS", "32"))
+
+ENDPOINT_CONCURRENCY = {
+    "parse": int(os.environ.get("PARSE_CONCURRENCY", "8")),
+    "test": int(os.environ.get("TEST_CONCURRENCY", "16")),
+    "health": int(os.environ.get("HEALTH_CONCURRENCY", "4")),
+    "status": int(os.environ.get("STATUS_CONCURRENCY", "16")),
+    "default": int(os.environ.get("DEFAULT_CONCURRENCY", "8")),
+}
+
 SAMPLE_PROMPTS = [
     "Create a customer support agent that can check order status and answer product questions. Make it helpful and professional.",
     "Build a coding assistant that can explain code, debug issues, and suggest improvements. Make it patient and educational.",
@@ -34,14 +133,49 @@ def _get_project_from_credentials():
         pass
     return None
 
+_project_config_cache = {"key": None, "value": None}
+
+def _project_config_key():
+    credentials_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    try:
+        mtime = os.path.getmtime(credentials_file) if credentials_file else None
+    except OSError:
+        mtime = None
+    
+    return (
+        os.environ.get("VERTEX_AI_PROJECT_ID"),
+        os.environ.get("VERTEX_AI_LOCATION"),
+        os.environ.get("VERTEX_AI_LOCATIONS"),
+        os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON"),
+        credentials_file,
+        mtime,
+    )
+
+def vertex_api_base_url(location: str) -> str:
+    return VERTEX_API_BASE_URL or f"https://{location}-aiplatform.googleapis.com"
+
 def get_project_config():
+    key = _project_config_key()
+    if _project_config_cache["key"] == key:
+        return dict(_project_config_cache["value"])
+    
     project_id = os.environ.get("VERTEX_AI_PROJECT_ID")
     if not project_id:
         project_id = _get_project_from_credentials()
     if not project_id:
         project_id = DEFAULT_PROJECT_ID
     
-    return {
+    location = os.environ.get("VERTEX_AI_LOCATION", DEFAULT_LOCATION)
+    locations = [location]
+    for extra in os.environ.get("VERTEX_AI_LOCATIONS", "").split(","):
+        extra = extra.strip()
+        if extra and extra not in locations:
+            locations.append(extra)
+    
+    value = {
         "project_id": project_id,
-        "location": os.environ.get("VERTEX_AI_LOCATION", DEFAULT_LOCATION),
+        "location": location,
+        "locations": locations,
     }
+    _project_config_cache.update(key=key, value=value)
+    return dict(value)
@@ -1,6 +1,9 @@
 import os
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 print("=" * 50)
 print("STARTUP: Checking environment variables...")
@@ -15,13 +18,57 @@ print("=" * 50)
 
 try:
     from backend.routers import agents
+    from backend.config import PARSE_CACHE_PREWARM, SDK_PREWARM
+    from backend.services.auth import has_credentials
+    from backend.services.executor import get_executor, shutdown_executor
+    from backend.services.gemini_parser import prewarm_parse_cache
+    from backend.services.engine_pool import engine_pool
+    from backend.services.http import close_session
+    from backend.services.keep_warm import keep_warm
+    from backend.services.metrics import HTTP_REQUEST_SECONDS, render_metrics
+    from backend.services.scheduler import deployment_scheduler
+    from backend.services.sdk import prewarm_sdk
+    from backend.services.vertex_ai import recover_interrupted_deployments, deployment_store
 except ImportError:
     from routers import agents
+    from config import PARSE_CACHE_PREWARM, SDK_PREWARM
+    from services.auth import has_credentials
+    from services.executor import get_executor, shutdown_executor
+    from services.gemini_parser import prewarm_parse_cache
+    from services.engine_pool import engine_pool
+    from services.http import close_session
+    from services.keep_warm import keep_warm
+    from services.metrics import HTTP_REQUEST_SECONDS, render_metrics
+    from services.scheduler import deployment_scheduler
+    from services.sdk import prewarm_sdk
+    from services.vertex_ai import recover_interrupted_deployments, deployment_store
+
+def _prewarm():
+    if not has_credentials():
+        return
+    if SDK_PREWARM:
+        prewarm_sdk()
+    engine_pool.start(leases=deployment_store)
+    keep_warm.start()
+    if PARSE_CACHE_PREWARM:
+        prewarm_parse_cache()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    recover_interrupted_deployments()
+    get_executor().submit(_prewarm)
+    yield
+    engine_pool.stop()
+    keep_warm.stop()
+    deployment_scheduler.shutdown()
+    shutdown_executor()
+    close_session()
 
 app = FastAPI(
     title="Vertex AI Agent Builder API",
     description="API for creating and deploying AI agents on Vertex AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -32,8 +79,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
 app.include_router(agents.router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {
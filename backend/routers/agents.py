@@ -1,33 +1,92 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import math
+import time
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 
 try:
-    from backend.services.gemini_parser import parse_agent_requirements
+    from backend.services.gemini_parser import parse_agent_requirements, stream_agent_requirements, parse_cache_key
     from backend.services.vertex_ai import (
         start_deployment,
+        answer_query,
         get_deployment_status,
+        get_deployment_artifacts,
+        status_etag,
+        get_completed_deployment,
         test_agent,
+        stream_test_agent,
+        cancel_deployment,
+        delete_deployment,
         DeploymentStatus
     )
-    from backend.config import SAMPLE_PROMPTS, get_project_config
-    from backend.services.auth import has_credentials
+    from backend.config import (
+        SAMPLE_PROMPTS,
+        STATUS_HEARTBEAT_SECONDS,
+        PARSE_BATCH_MAX_ITEMS,
+        PARSE_BATCH_CONCURRENCY,
+        TEST_BATCH_MAX_ITEMS,
+        TEST_BATCH_CONCURRENCY,
+        DEPLOY_WORKERS,
+        DEPLOY_PROJECT_CONCURRENCY,
+        get_project_config,
+    )
+    from backend.services.auth import has_credentials, peek_has_credentials, probe_credentials, get_token_stats
+    from backend.services.executor import run_blocking, stream_blocking
+    from backend.services.events import deployment_events
+    from backend.services.scheduler import QueueFullError
+    from backend.services.rate_limit import RateLimitExceeded, vertex_limiter, queue_timer, is_throttle_error
+    from backend.services.metrics import SPAN_SECONDS
+    from backend.services.bulk import start_bulk_deployment, get_bulk_report
+    from backend.services.keep_warm import keep_warm
+    from backend.services.regions import region_router
 except ImportError:
-    from services.gemini_parser import parse_agent_requirements
+    from services.gemini_parser import parse_agent_requirements, stream_agent_requirements, parse_cache_key
     from services.vertex_ai import (
         start_deployment,
+        answer_query,
         get_deployment_status,
+        get_deployment_artifacts,
+        status_etag,
+        get_completed_deployment,
         test_agent,
+        stream_test_agent,
+        cancel_deployment,
+        delete_deployment,
         DeploymentStatus
     )
-    from config import SAMPLE_PROMPTS, get_project_config
-    from services.auth import has_credentials
+    from config import (
+        SAMPLE_PROMPTS,
+        STATUS_HEARTBEAT_SECONDS,
+        PARSE_BATCH_MAX_ITEMS,
+        PARSE_BATCH_CONCURRENCY,
+        TEST_BATCH_MAX_ITEMS,
+        TEST_BATCH_CONCURRENCY,
+        DEPLOY_WORKERS,
+        DEPLOY_PROJECT_CONCURRENCY,
+        get_project_config,
+    )
+    from services.auth import has_credentials, peek_has_credentials, probe_credentials, get_token_stats
+    from services.executor import run_blocking, stream_blocking
+    from services.events import deployment_events
+    from services.scheduler import QueueFullError
+    from services.rate_limit import RateLimitExceeded, vertex_limiter, queue_timer, is_throttle_error
+    from services.metrics import SPAN_SECONDS
+    from services.bulk import start_bulk_deployment, get_bulk_report
+    from services.keep_warm import keep_warm
+    from services.regions import region_router
 
 router = APIRouter(prefix="/api", tags=["agents"])
 
 class ParseRequest(BaseModel):
     user_request: str
 
+class BatchParseRequest(BaseModel):
+    user_requests: List[str]
+    concurrency: Optional[int] = None
+
 class AgentConfig(BaseModel):
     agent_name: str
     agent_type: str
@@ -39,90 +98,547 @@ class AgentConfig(BaseModel):
 
 class DeployRequest(BaseModel):
     config: AgentConfig
+    replaces: Optional[str] = None
+
+class BulkDeployRequest(BaseModel):
+    configs: List[AgentConfig]
+    parallelism: Optional[int] = None
+    run_id: Optional[str] = None
 
 class TestRequest(BaseModel):
     deployment_id: str
     query: str
 
+class BatchTestRequest(BaseModel):
+    deployment_id: str
+    queries: List[str]
+    concurrency: Optional[int] = None
+
 class ParseResponse(BaseModel):
     config: dict
 
+class BatchParseItem(BaseModel):
+    index: int
+    config: Optional[dict] = None
+    error: Optional[str] = None
+
+class BatchParseResponse(BaseModel):
+    results: List[BatchParseItem]
+    succeeded: int
+    failed: int
+    elapsed_seconds: float
+
 class DeployResponse(BaseModel):
     deployment_id: str
 
+class BulkDeployResponse(BaseModel):
+    run_id: str
+    parallelism: int
+
 class StatusResponse(BaseModel):
     id: str
+    version: int = 0
     status: str
+    phase: Optional[str] = None
+    queue_position: Optional[int] = None
+    start_time: Optional[float] = None
     elapsed_seconds: float
     result: Optional[dict] = None
     error: Optional[str] = None
 
+class ArtifactsResponse(BaseModel):
+    id: str
+    config: dict
+    system_message: str
+    agent_code: str
+
 class TestResponse(BaseModel):
     response: str
 
+class BatchTestItem(BaseModel):
+    index: int
+    query: str
+    response: Optional[str] = None
+    tier: Optional[str] = None
+    cached: bool = False
+    latency_seconds: float
+    queue_seconds: float = 0.0
+    error: Optional[str] = None
+
+class BatchTestResponse(BaseModel):
+    results: List[BatchTestItem]
+    succeeded: int
+    failed: int
+    elapsed_seconds: float
+    latency: dict
+    queue: dict
+    tiers: dict
+
 class HealthResponse(BaseModel):
     status: str
     has_credentials: bool
     project_id: str
     location: str
 
+class DeepHealthResponse(BaseModel):
+    status: str
+    has_credentials: bool
+    credential_source: str
+    token_valid: bool
+    project_id: str
+    location: str
+    probe_seconds: float
+    token_stats: dict
+    rate_limit_stats: dict
+    region_stats: dict
+    error: Optional[str] = None
+
 class SamplePromptsResponse(BaseModel):
     prompts: List[str]
 
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def _stream_error_event(error: Exception) -> str:
+    """Once a stream has started the status code is sent, so throttling gets its own event."""
+    if isinstance(error, RateLimitExceeded) or is_throttle_error(error):
+        return _sse_event({"detail": str(error), "status": 429, "retry_after": 30}, event="throttled")
+    return _sse_event({"detail": str(error)}, event="error")
+
+async def _check_credentials(endpoint: str) -> bool:
+    cached = peek_has_credentials()
+    if cached is not None:
+        return cached
+    return await run_blocking(endpoint, has_credentials)
+
+async def _require_credentials(endpoint: str):
+    if not await _check_credentials(endpoint):
+        raise HTTPException(status_code=401, detail="Google Cloud credentials not configured")
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     config = get_project_config()
     return HealthResponse(
         status="ok",
-        has_credentials=has_credentials(),
+        has_credentials=await _check_credentials("health"),
         project_id=config["project_id"],
         location=config["location"]
     )
 
+@router.get("/health/deep", response_model=DeepHealthResponse)
+async def deep_health_check():
+    started = time.perf_counter()
+    probe = await run_blocking("health", probe_credentials)
+    config = get_project_config()
+    return DeepHealthResponse(
+        status="ok" if probe["token_valid"] else "degraded",
+        has_credentials=probe["has_credentials"],
+        credential_source=probe["credential_source"],
+        token_valid=probe["token_valid"],
+        project_id=config["project_id"],
+        location=config["location"],
+        probe_seconds=time.perf_counter() - started,
+        token_stats=get_token_stats(),
+        rate_limit_stats=vertex_limiter.stats(),
+        region_stats=region_router.stats(),
+        error=probe["error"]
+    )
+
+@router.get("/keep-warm")
+async def get_keep_warm_stats():
+    return {
+        "enabled": keep_warm.enabled,
+        "interval_seconds": keep_warm.interval_seconds,
+        "cold_after_seconds": keep_warm.cold_after_seconds,
+        "engines": keep_warm.stats(),
+    }
+
+@router.get("/regions")
+async def get_region_stats():
+    return {
+        "locations": region_router.ranked(),
+        "regions": region_router.stats(),
+    }
+
 @router.get("/sample-prompts", response_model=SamplePromptsResponse)
 async def get_sample_prompts():
     return SamplePromptsResponse(prompts=SAMPLE_PROMPTS)
 
 @router.post("/parse", response_model=ParseResponse)
 async def parse_requirements(request: ParseRequest):
-    if not has_credentials():
-        raise HTTPException(status_code=401, detail="Google Cloud credentials not configured")
+    await _require_credentials("parse")
     
     try:
-        config = parse_agent_requirements(request.user_request)
+        config = await run_blocking("parse", parse_agent_requirements, request.user_request)
         return ParseResponse(config=config)
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/parse/stream")
+async def stream_parse_requirements(request: ParseRequest):
+    await _require_credentials("parse")
+    
+    async def events():
+        started = time.perf_counter()
+        first_field_seconds = None
+        try:
+            async for item in stream_blocking("parse", stream_agent_requirements, request.user_request):
+                if "config" in item:
+                    yield _sse_event({
+                        "config": item["config"],
+                        "first_field_seconds": first_field_seconds,
+                        "total_seconds": time.perf_counter() - started,
+                    }, event="done")
+                    continue
+                if first_field_seconds is None:
+                    first_field_seconds = time.perf_counter() - started
+                    SPAN_SECONDS.observe(first_field_seconds, stage="parse_stream.first_field", outcome="ok")
+                yield _sse_event(item)
+        except Exception as e:
+            yield _stream_error_event(e)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/parse/batch", response_model=BatchParseResponse)
+async def parse_requirements_batch(request: BatchParseRequest, stream: bool = False):
+    await _require_credentials("parse")
+    
+    if not request.user_requests:
+        raise HTTPException(status_code=422, detail="user_requests must not be empty")
+    if len(request.user_requests) > PARSE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {PARSE_BATCH_MAX_ITEMS} requests per batch")
+    
+    started = time.perf_counter()
+    limiter = asyncio.Semaphore(max(1, min(request.concurrency or PARSE_BATCH_CONCURRENCY, PARSE_BATCH_CONCURRENCY)))
+    
+    # Requests that normalize to the same cache key share one Gemini call.
+    groups = {}
+    for index, user_request in enumerate(request.user_requests):
+        groups.setdefault(parse_cache_key(user_request), []).append((index, user_request))
+    
+    async def parse_group(members):
+        async with limiter:
+            try:
+                config = await run_blocking("parse", parse_agent_requirements, members[0][1])
+                return [BatchParseItem(index=index, config=config) for index, _ in members]
+            except Exception as e:
+                return [BatchParseItem(index=index, error=str(e)) for index, _ in members]
+    
+    tasks = [asyncio.create_task(parse_group(members)) for members in groups.values()]
+    
+    def summary(results):
+        failed = sum(1 for item in results if item.error is not None)
+        return {
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "elapsed_seconds": time.perf_counter() - started,
+        }
+    
+    if stream:
+        async def events():
+            results = []
+            try:
+                for task in asyncio.as_completed(tasks):
+                    for item in await task:
+                        results.append(item)
+                        yield _sse_event(item.model_dump())
+                yield _sse_event(summary(results), event="done")
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    results = sorted((item for items in await asyncio.gather(*tasks) for item in items), key=lambda item: item.index)
+    return BatchParseResponse(results=results, **summary(results))
+
 @router.post("/deploy", response_model=DeployResponse)
 async def deploy_agent(request: DeployRequest):
-    if not has_credentials():
-        raise HTTPException(status_code=401, detail="Google Cloud credentials not configured")
+    await _require_credentials("default")
     
     try:
-        deployment_id = start_deployment(request.config.model_dump())
+        deployment_id = await run_blocking("status", start_deployment, request.config.model_dump(), request.replaces)
         return DeployResponse(deployment_id=deployment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/status/{deployment_id}", response_model=StatusResponse)
-async def get_status(deployment_id: str):
-    status = get_deployment_status(deployment_id)
+@router.post("/deploy/bulk", response_model=BulkDeployResponse)
+async def bulk_deploy_agents(request: BulkDeployRequest):
+    await _require_credentials("default")
+    
+    # Every deployment goes through the shared scheduler, which runs at most
+    # DEPLOY_PROJECT_CONCURRENCY per project; more bulk threads would only wait.
+    max_parallelism = max(1, min(DEPLOY_WORKERS, DEPLOY_PROJECT_CONCURRENCY))
+    if request.parallelism is not None and not 1 <= request.parallelism <= max_parallelism:
+        raise HTTPException(
+            status_code=422,
+            detail=f"parallelism must be between 1 and {max_parallelism} "
+                   "(capped by DEPLOY_WORKERS and DEPLOY_PROJECT_CONCURRENCY)"
+        )
+    parallelism = request.parallelism or max_parallelism
+    try:
+        run_id = start_bulk_deployment(
+            [config.model_dump() for config in request.configs],
+            parallelism,
+            run_id=request.run_id
+        )
+        return BulkDeployResponse(run_id=run_id, parallelism=parallelism)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/deploy/bulk/{run_id}")
+async def get_bulk_deploy_report(run_id: str):
+    report = await run_blocking("status", get_bulk_report, run_id)
+    
+    if report is None:
+        raise HTTPException(status_code=404, detail="Bulk run not found")
+    
+    return report
+
+@router.post("/deploy/{deployment_id}/cancel", response_model=StatusResponse)
+async def cancel_deploy(deployment_id: str):
+    status = await run_blocking("status", cancel_deployment, deployment_id)
     
     if status is None:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
     return StatusResponse(**status)
 
+@router.delete("/deploy/{deployment_id}", status_code=204)
+async def delete_deploy(deployment_id: str):
+    try:
+        deleted = await run_blocking("default", delete_deployment, deployment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+
+def _conditional_json(request: Request, body, etag: str) -> Response:
+    # no-cache makes browsers revalidate every poll, so a repeated poll costs a 304.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+@router.get("/status/{deployment_id}", response_model=StatusResponse)
+async def get_status(deployment_id: str, request: Request, fields: Optional[str] = None):
+    include = None
+    if fields:
+        include = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = include - set(StatusResponse.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown status fields: {', '.join(sorted(unknown))}")
+    
+    status = await run_blocking("status", get_deployment_status, deployment_id)
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    # The projection is part of the representation, so it is part of the tag.
+    etag = status_etag(status)
+    if include:
+        etag = etag[:-1] + ";" + ",".join(sorted(include)) + '"'
+    return _conditional_json(request, StatusResponse(**status).model_dump(include=include), etag)
+
+@router.get("/status/{deployment_id}/artifacts", response_model=ArtifactsResponse)
+async def get_artifacts(deployment_id: str, request: Request):
+    artifacts = await run_blocking("status", get_deployment_artifacts, deployment_id)
+    
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    # The config, and everything generated from it, never changes for a deployment id.
+    return _conditional_json(request, ArtifactsResponse(**artifacts).model_dump(), f'W/"{deployment_id}:artifacts"')
+
+@router.get("/status/{deployment_id}/events")
+async def stream_status(deployment_id: str):
+    if await run_blocking("status", get_deployment_status, deployment_id) is None:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    async def events():
+        queue = deployment_events.subscribe(deployment_id)
+        try:
+            status = await run_blocking("status", get_deployment_status, deployment_id)
+            while True:
+                yield _sse_event(StatusResponse(**status).model_dump())
+                if status["status"] in (DeploymentStatus.COMPLETED, DeploymentStatus.ERROR, DeploymentStatus.CANCELLED,
+                                        DeploymentStatus.SUPERSEDED):
+                    return
+                try:
+                    status = await asyncio.wait_for(queue.get(), timeout=STATUS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    status = await run_blocking("status", get_deployment_status, deployment_id)
+        finally:
+            deployment_events.unsubscribe(deployment_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/test", response_model=TestResponse)
 async def test_deployed_agent(request: TestRequest):
-    if not has_credentials():
-        raise HTTPException(status_code=401, detail="Google Cloud credentials not configured")
+    await _require_credentials("test")
     
     try:
-        response = test_agent(request.deployment_id, request.query)
+        response = await run_blocking("test", test_agent, request.deployment_id, request.query)
         return TestResponse(response=response)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def _latency_distribution(latencies: List[float]) -> dict:
+    ordered = sorted(latencies)
+    
+    def percentile(p):
+        if not ordered:
+            return None
+        return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+    
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else None,
+        "min": ordered[0] if ordered else None,
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": ordered[-1] if ordered else None,
+    }
+
+@router.post("/test/batch", response_model=BatchTestResponse)
+async def test_deployed_agent_batch(request: BatchTestRequest, stream: bool = False):
+    await _require_credentials("test")
+    
+    if not request.queries:
+        raise HTTPException(status_code=422, detail="queries must not be empty")
+    if len(request.queries) > TEST_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {TEST_BATCH_MAX_ITEMS} queries per batch")
+    try:
+        await run_blocking("test", get_completed_deployment, request.deployment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    started = time.perf_counter()
+    limiter = asyncio.Semaphore(max(1, min(request.concurrency or TEST_BATCH_CONCURRENCY, TEST_BATCH_CONCURRENCY)))
+    
+    def timed_answer(query):
+        # Timed on the worker, minus rate-limiter waits, so latency describes
+        # the agent; the local queueing is reported as queue_seconds.
+        started_answer = time.perf_counter()
+        with queue_timer() as queued:
+            try:
+                answer, error = answer_query(request.deployment_id, query), None
+            except Exception as e:
+                answer, error = None, e
+        return answer, error, time.perf_counter() - started_answer - queued.seconds
+    
+    async def run_query(index, query):
+        async with limiter:
+            query_started = time.perf_counter()
+            try:
+                answer, error, latency_seconds = await run_blocking("test", timed_answer, query)
+            except Exception as e:
+                answer, error, latency_seconds = None, e, 0.0
+            timing = {"latency_seconds": latency_seconds,
+                      "queue_seconds": time.perf_counter() - query_started - latency_seconds}
+            if error is not None:
+                return BatchTestItem(index=index, query=query, error=str(error), **timing)
+            if answer["tier"] == "error":
+                return BatchTestItem(index=index, query=query, tier="error", error=answer["response"], **timing)
+            return BatchTestItem(index=index, query=query, **answer, **timing)
+    
+    tasks = [asyncio.create_task(run_query(index, query)) for index, query in enumerate(request.queries)]
+    
+    def summary(results):
+        failed = sum(1 for item in results if item.error is not None)
+        tiers = {}
+        for item in results:
+            tier = item.tier or "failed"
+            tiers[tier] = tiers.get(tier, 0) + 1
+        return {
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "elapsed_seconds": time.perf_counter() - started,
+            "latency": _latency_distribution([item.latency_seconds for item in results if item.error is None]),
+            "queue": _latency_distribution([item.queue_seconds for item in results]),
+            "tiers": tiers,
+        }
+    
+    if stream:
+        async def events():
+            results = []
+            try:
+                for task in asyncio.as_completed(tasks):
+                    item = await task
+                    results.append(item)
+                    yield _sse_event(item.model_dump())
+                yield _sse_event(summary(results), event="done")
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    results = sorted(await asyncio.gather(*tasks), key=lambda item: item.index)
+    return BatchTestResponse(results=results, **summary(results))
+
+@router.post("/test/stream")
+async def stream_deployed_agent(request: TestRequest):
+    await _require_credentials("test")
+    
+    try:
+        await run_blocking("test", get_completed_deployment, request.deployment_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    async def events():
+        tier = None
+        started = time.perf_counter()
+        first_token_seconds = None
+        try:
+            async for chunk in stream_blocking("test", stream_test_agent, request.deployment_id, request.query):
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                    SPAN_SECONDS.observe(first_token_seconds, stage="test_stream.first_token", outcome="ok")
+                tier = chunk["tier"]
+                yield _sse_event(chunk)
+            yield _sse_event({
+                "tier": tier,
+                "first_token_seconds": first_token_seconds,
+                "total_seconds": time.perf_counter() - started,
+            }, event="done")
+        except Exception as e:
+            yield _stream_error_event(e)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,102 +1,263 @@
 import os
 import json
 import tempfile
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request as AuthRequest
-import google.auth
+import threading
+import time
+from datetime import datetime, timezone
 
 try:
-    from backend.config import VERTEX_AI_SCOPES
+    from backend.config import (
+        VERTEX_AI_SCOPES,
+        CLOUD_PLATFORM_SCOPES,
+        TOKEN_REFRESH_MARGIN_SECONDS,
+        CREDENTIAL_PROBE_TTL_SECONDS,
+    )
+    from backend.services.metrics import span, register, Collector
 except ImportError:
-    from config import VERTEX_AI_SCOPES
+    from config import (
+        VERTEX_AI_SCOPES,
+        CLOUD_PLATFORM_SCOPES,
+        TOKEN_REFRESH_MARGIN_SECONDS,
+        CREDENTIAL_PROBE_TTL_SECONDS,
+    )
+    from services.metrics import span, register, Collector
 
-_cached_credentials = None
 _cached_credentials_path = None
 
-def get_credentials():
-    global _cached_credentials, _cached_credentials_path
-    
+def _credentials_source():
     credentials_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+    if credentials_json:
+        return ("json", credentials_json)
+    
     credentials_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if credentials_file and os.path.exists(credentials_file):
+        return ("file", credentials_file, os.path.getmtime(credentials_file))
     
-    if credentials_json:
-        if _cached_credentials_path is None:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                f.write(credentials_json)
-                _cached_credentials_path = f.name
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _cached_credentials_path
+    return ("default",)
+
+def _load_credentials(source, scopes):
+    # google-auth is imported on first use so importing the app stays cheap.
+    from google.oauth2 import service_account
+    import google.auth
+
+    if source[0] == "json":
+        credentials_info = json.loads(source[1])
+        return service_account.Credentials.from_service_account_info(credentials_info, scopes=scopes)
+    
+    if source[0] == "file":
+        return service_account.Credentials.from_service_account_file(source[1], scopes=scopes)
+    
+    credentials, project = google.auth.default(scopes=scopes)
+    return credentials
+
+class _TokenEntry:
+    def __init__(self, source, credentials):
+        self.source = source
+        self.credentials = credentials
+        self.refresh_lock = threading.Lock()
+
+class TokenManager:
+    """Process-wide cache of credentials and access tokens, one entry per scope set."""
+    
+    def __init__(self, refresh_margin_seconds: int = TOKEN_REFRESH_MARGIN_SECONDS):
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {
+            "hits": 0,
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "failures": 0,
+        }
+    
+    def _get_entry(self, scopes):
+        key = tuple(sorted(scopes))
+        source = _credentials_source()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.source == source:
+                return entry
         
-        credentials_info = json.loads(credentials_json)
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_info,
-            scopes=VERTEX_AI_SCOPES
-        )
-        return credentials
-    
-    elif credentials_file and os.path.exists(credentials_file):
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials_file,
-            scopes=VERTEX_AI_SCOPES
-        )
-        return credentials
-    
-    else:
+        with span("auth.load_credentials"):
+            credentials = _load_credentials(source, list(key))
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.source != source:
+                entry = _TokenEntry(source, credentials)
+                self._entries[key] = entry
+            return entry
+    
+    def _seconds_until_expiry(self, credentials):
+        if not credentials.token:
+            return None
+        if credentials.expiry is None:
+            return float("inf")
+        expiry = credentials.expiry.replace(tzinfo=timezone.utc)
+        return (expiry - datetime.now(timezone.utc)).total_seconds()
+    
+    def _refresh(self, entry, background: bool = False):
+        from google.auth.transport.requests import Request as AuthRequest
+
         try:
-            credentials, project = google.auth.default(scopes=VERTEX_AI_SCOPES)
-            return credentials
+            with span("auth.refresh_token"):
+                entry.credentials.refresh(AuthRequest())
+            with self._lock:
+                self._stats["refreshes"] += 1
+                if background:
+                    self._stats["background_refreshes"] += 1
         except Exception:
-            return None
+            with self._lock:
+                self._stats["failures"] += 1
+            raise
+    
+    def _refresh_in_background(self, entry):
+        if not entry.refresh_lock.acquire(blocking=False):
+            return
+        
+        def worker():
+            try:
+                self._refresh(entry, background=True)
+            except Exception as e:
+                print(f"[AUTH] Background token refresh failed: {e}", flush=True)
+            finally:
+                entry.refresh_lock.release()
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def get_credentials(self, scopes):
+        return self._get_entry(scopes).credentials
+    
+    def get_token(self, scopes):
+        entry = self._get_entry(scopes)
+        remaining = self._seconds_until_expiry(entry.credentials)
+        
+        if remaining is not None and remaining > 0:
+            with self._lock:
+                self._stats["hits"] += 1
+            if remaining <= self.refresh_margin_seconds:
+                self._refresh_in_background(entry)
+            return entry.credentials.token
+        
+        with entry.refresh_lock:
+            remaining = self._seconds_until_expiry(entry.credentials)
+            if remaining is None or remaining <= 0:
+                self._refresh(entry)
+            else:
+                with self._lock:
+                    self._stats["hits"] += 1
+        return entry.credentials.token
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached_scope_sets=len(self._entries))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
-def get_access_token():
+token_manager = TokenManager()
+
+register(Collector(
+    "agent_builder_token_events_total", "counter", "Access-token cache hits, refreshes and failures",
+    lambda: (({"event": name}, value) for name, value in token_manager.stats().items() if name != "cached_scope_sets")
+))
+
+def get_credentials():
+    global _cached_credentials_path
+    
     credentials_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-    credentials_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if credentials_json and _cached_credentials_path is None:
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            f.write(credentials_json)
+            _cached_credentials_path = f.name
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _cached_credentials_path
     
     try:
-        if credentials_json:
-            credentials_info = json.loads(credentials_json)
-            credentials = service_account.Credentials.from_service_account_info(
-                credentials_info,
-                scopes=["https://www.googleapis.com/auth/cloud-platform"]
-            )
-        elif credentials_file and os.path.exists(credentials_file):
-            credentials = service_account.Credentials.from_service_account_file(
-                credentials_file,
-                scopes=["https://www.googleapis.com/auth/cloud-platform"]
-            )
-        else:
-            credentials, project = google.auth.default(
-                scopes=["https://www.googleapis.com/auth/cloud-platform"]
-            )
-        
-        auth_req = AuthRequest()
-        credentials.refresh(auth_req)
-        
-        return credentials.token if credentials.token else None
+        return token_manager.get_credentials(VERTEX_AI_SCOPES)
+    except Exception:
+        return None
+
+def get_access_token():
+    try:
+        token = token_manager.get_token(CLOUD_PLATFORM_SCOPES)
+        return token if token else None
     except Exception as e:
         print(f"Failed to get access token: {e}")
         return None
 
-def has_credentials():
-    import sys
-    
-    if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS_JSON"):
-        print("[AUTH] Found GOOGLE_APPLICATION_CREDENTIALS_JSON", flush=True)
+def get_token_stats() -> dict:
+    return token_manager.stats()
+
+_probe_lock = threading.Lock()
+_probe_cache = {"source": None, "result": None, "checked_at": 0.0}
+
+def _describe_source(source) -> str:
+    if source[0] == "json":
+        return "GOOGLE_APPLICATION_CREDENTIALS_JSON"
+    if source[0] == "file":
+        return f"GOOGLE_APPLICATION_CREDENTIALS ({source[1]})"
+    return "application default credentials"
+
+def _probe_source(source) -> bool:
+    if source[0] in ("json", "file"):
         return True
     
-    credentials_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    print(f"[AUTH] Checking credentials...", flush=True)
-    print(f"[AUTH] GOOGLE_APPLICATION_CREDENTIALS = {credentials_file}", flush=True)
-    
-    if credentials_file:
-        file_exists = os.path.exists(credentials_file)
-        print(f"[AUTH] File exists: {file_exists}", flush=True)
-        if file_exists:
-            return True
-    
     try:
+        import google.auth
+
         credentials, project = google.auth.default()
         print(f"[AUTH] Using default credentials for project: {project}", flush=True)
         return True
     except Exception as e:
         print(f"[AUTH] No default credentials: {e}", flush=True)
         return False
+
+def peek_has_credentials():
+    """Return the memoized credential check, or None if it has to be re-probed."""
+    source = _credentials_source()
+    if _probe_cache["source"] != source:
+        return None
+    if source[0] == "default" and time.time() - _probe_cache["checked_at"] > CREDENTIAL_PROBE_TTL_SECONDS:
+        return None
+    return _probe_cache["result"]
+
+def has_credentials():
+    cached = peek_has_credentials()
+    if cached is not None:
+        return cached
+    
+    with _probe_lock:
+        cached = peek_has_credentials()
+        if cached is not None:
+            return cached
+        
+        source = _credentials_source()
+        result = _probe_source(source)
+        previous = _probe_cache["source"]
+        if previous is None or previous[0] != source[0] or result != _probe_cache["result"]:
+            print(f"[AUTH] Credentials {'found' if result else 'missing'} via {_describe_source(source)}", flush=True)
+        _probe_cache.update(source=source, result=result, checked_at=time.time())
+        return result
+
+def probe_credentials() -> dict:
+    """Expensive end-to-end check: resolve credentials and mint an access token."""
+    source = _credentials_source()
+    result = {
+        "has_credentials": False,
+        "credential_source": _describe_source(source),
+        "token_valid": False,
+        "error": None,
+    }
+    
+    try:
+        result["has_credentials"] = _probe_source(source)
+        if result["has_credentials"]:
+            result["token_valid"] = bool(token_manager.get_token(CLOUD_PLATFORM_SCOPES))
+    except Exception as e:
+        result["error"] = str(e)
+    
+    with _probe_lock:
+        _probe_cache.update(source=source, result=result["has_credentials"], checked_at=time.time())
+    return result
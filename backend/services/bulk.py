@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from backend.config import BULK_CHECKPOINT_DIR, BULK_POLL_SECONDS, BULK_MAX_FINISHED_RUNS
+    from backend.services.scheduler import QueueFullError
+    from backend.services.vertex_ai import start_deployment, get_deployment_status, DeploymentStatus
+except ImportError:
+    from config import BULK_CHECKPOINT_DIR, BULK_POLL_SECONDS, BULK_MAX_FINISHED_RUNS
+    from services.scheduler import QueueFullError
+    from services.vertex_ai import start_deployment, get_deployment_status, DeploymentStatus
+
+REQUIRED_CONFIG_FIELDS = ["agent_name", "agent_type", "description", "capabilities",
+                          "tools", "personality", "instructions"]
+
+TERMINAL_STATUSES = (DeploymentStatus.COMPLETED, DeploymentStatus.ERROR, DeploymentStatus.CANCELLED)
+
+def load_manifest(path: str) -> list:
+    """Read agent configs from a .jsonl, .json or .yaml/.yml manifest."""
+    with open(path, "r") as f:
+        text = f.read()
+
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("YAML manifests require PyYAML (pip install pyyaml)")
+        data = yaml.safe_load(text)
+    elif path.endswith(".jsonl"):
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        data = json.loads(text)
+
+    if isinstance(data, dict):
+        data = data.get("agents", [])
+    configs = [entry.get("config", entry) for entry in data]
+    validate_configs(configs)
+    return configs
+
+def validate_configs(configs: list):
+    for index, config in enumerate(configs):
+        missing = [field for field in REQUIRED_CONFIG_FIELDS if field not in config]
+        if missing:
+            raise ValueError(f"Manifest entry {index} is missing: {', '.join(missing)}")
+
+def config_key(config: dict) -> str:
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+class BulkDeployment:
+    """Deploys many configs through the deployment scheduler with a checkpoint file.
+
+    Entries already recorded as completed in the checkpoint are skipped, so
+    re-running with the same checkpoint resumes a crashed run.
+    """
+
+    def __init__(self, configs: list, parallelism: int, checkpoint_path: str = None,
+                 run_id: str = None, poll_seconds: float = BULK_POLL_SECONDS):
+        self.run_id = run_id or str(uuid.uuid4())
+        self.configs = configs
+        self.parallelism = max(1, parallelism)
+        self.checkpoint_path = checkpoint_path
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._started_at = None
+        self._finished_at = None
+        self._entries = [
+            {
+                "index": index,
+                # The position keeps duplicate manifest entries apart.
+                "key": f"{index}:{config_key(config)}",
+                "config_key": config_key(config),
+                "agent_name": config.get("agent_name"),
+                "status": "queued",
+                "deployment_id": None,
+                "resource_name": None,
+                "error": None,
+                "duration_seconds": None,
+            }
+            for index, config in enumerate(configs)
+        ]
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, "r") as f:
+            saved = json.load(f).get("entries", {})
+        completed = {key: entry for key, entry in saved.items() if entry.get("status") == DeploymentStatus.COMPLETED}
+        unmatched = []
+        for entry in self._entries:
+            previous = completed.pop(entry["key"], None)
+            if previous:
+                self._skip(entry, previous)
+            else:
+                unmatched.append(entry)
+        # If the manifest was reordered, match the rest by config alone, each
+        # completed entry at most once so duplicates still deploy as often as listed.
+        by_config = {}
+        for previous in completed.values():
+            by_config.setdefault(previous.get("config_key") or previous["key"].split(":")[-1], []).append(previous)
+        for entry in unmatched:
+            candidates = by_config.get(entry["config_key"])
+            if candidates:
+                self._skip(entry, candidates.pop(0))
+
+    @staticmethod
+    def _skip(entry: dict, previous: dict):
+        # Keep this run's position and key; take the outcome from the checkpoint.
+        entry.update({k: v for k, v in previous.items() if k not in ("index", "key")}, status="skipped")
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            entries = {
+                entry["key"]: dict(entry, status=DeploymentStatus.COMPLETED if entry["status"] == "skipped" else entry["status"])
+                for entry in self._entries
+                if entry["status"] in TERMINAL_STATUSES or entry["status"] == "skipped"
+            }
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with self._checkpoint_lock:
+            with open(tmp_path, "w") as f:
+                json.dump({"run_id": self.run_id, "entries": entries}, f, indent=2)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def _submit(self, config: dict) -> str:
+        delay = self.poll_seconds
+        while True:
+            try:
+                return start_deployment(config)
+            except QueueFullError:
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def _deploy_one(self, entry: dict):
+        started = time.time()
+        with self._lock:
+            entry["status"] = "submitting"
+        try:
+            deployment_id = self._submit(self.configs[entry["index"]])
+            with self._lock:
+                entry["deployment_id"] = deployment_id
+            while True:
+                status = get_deployment_status(deployment_id)
+                if status is None:
+                    raise RuntimeError("Deployment record disappeared")
+                with self._lock:
+                    entry["status"] = status["status"]
+                if status["status"] in TERMINAL_STATUSES:
+                    break
+                time.sleep(self.poll_seconds)
+            with self._lock:
+                entry["resource_name"] = (status.get("result") or {}).get("resource_name")
+                entry["error"] = status.get("error")
+        except Exception as e:
+            with self._lock:
+                entry["status"] = DeploymentStatus.ERROR
+                entry["error"] = str(e)
+        with self._lock:
+            entry["duration_seconds"] = time.time() - started
+        self._save_checkpoint()
+        print(f"[BULK-{self.run_id[:8]}] {entry['agent_name']}: {entry['status']}", flush=True)
+
+    def run(self) -> dict:
+        self._started_at = time.time()
+        pending = [entry for entry in self._entries if entry["status"] != "skipped"]
+        print(f"[BULK-{self.run_id[:8]}] Deploying {len(pending)} agents "
+              f"({len(self._entries) - len(pending)} already done), parallelism {self.parallelism}", flush=True)
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="bulk-deploy") as pool:
+            list(pool.map(self._deploy_one, pending))
+        with self._lock:
+            self._finished_at = time.time()
+        self._save_checkpoint()
+        return self.report()
+
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            return self._finished_at is not None
+
+    def report(self) -> dict:
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries]
+            started_at, finished_at = self._started_at, self._finished_at
+        counts = {}
+        for entry in entries:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        durations = [e["duration_seconds"] for e in entries if e["duration_seconds"] is not None]
+        end = finished_at or time.time()
+        return {
+            "run_id": self.run_id,
+            "total": len(entries),
+            "counts": counts,
+            "finished": finished_at is not None,
+            "elapsed_seconds": end - started_at if started_at else 0.0,
+            "sum_of_deploy_seconds": sum(durations),
+            "entries": entries,
+        }
+
+bulk_runs = OrderedDict()
+_bulk_runs_lock = threading.Lock()
+
+def checkpoint_path_for(run_id: str) -> str:
+    return os.path.join(BULK_CHECKPOINT_DIR, f"{run_id}.json")
+
+def start_bulk_deployment(configs: list, parallelism: int, run_id: str = None) -> str:
+    """Start a bulk run in the background. Passing an earlier run_id resumes it from its checkpoint."""
+    validate_configs(configs)
+    run_id = run_id or str(uuid.uuid4())
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", run_id):
+        raise ValueError("run_id may only contain letters, digits, '-' and '_'")
+    with _bulk_runs_lock:
+        existing = bulk_runs.get(run_id)
+        if existing is not None and not existing.finished:
+            raise ValueError(f"Bulk run {run_id} is still in progress")
+
+        bulk = BulkDeployment(configs, parallelism, checkpoint_path=checkpoint_path_for(run_id), run_id=run_id)
+        bulk_runs[run_id] = bulk
+        bulk_runs.move_to_end(run_id)
+        _evict_finished_runs()
+    threading.Thread(target=bulk.run, name=f"bulk-{run_id[:8]}", daemon=True).start()
+    return run_id
+
+def _evict_finished_runs():
+    finished = [run_id for run_id, bulk in bulk_runs.items() if bulk.finished]
+    for run_id in finished[:max(0, len(finished) - BULK_MAX_FINISHED_RUNS)]:
+        del bulk_runs[run_id]
+
+def get_bulk_report(run_id: str):
+    with _bulk_runs_lock:
+        bulk = bulk_runs.get(run_id)
+    return bulk.report() if bulk else None
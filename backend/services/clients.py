@@ -0,0 +1,123 @@
+import datetime
+import threading
+
+try:
+    from backend.config import (
+        get_project_config,
+        CLIENT_CACHE_SIZE,
+        CONTEXT_CACHE_ENABLED,
+        CONTEXT_CACHE_TTL_SECONDS,
+        CONTEXT_CACHE_MIN_CHARS,
+    )
+    from backend.services.cache import LRUCache
+    from backend.services.metrics import register_cache
+except ImportError:
+    from config import (
+        get_project_config,
+        CLIENT_CACHE_SIZE,
+        CONTEXT_CACHE_ENABLED,
+        CONTEXT_CACHE_TTL_SECONDS,
+        CONTEXT_CACHE_MIN_CHARS,
+    )
+    from services.cache import LRUCache
+    from services.metrics import register_cache
+
+# The Vertex AI SDK takes seconds to import, so every factory below imports it
+# on first use rather than at module load.
+client_cache = LRUCache(CLIENT_CACHE_SIZE)
+
+# Entries are dropped a minute before the server-side TTL so a handle is never
+# used after Vertex has expired it. A failed creation is cached as None so
+# instructions that cannot be cached are not retried on every query.
+context_cache = LRUCache(CLIENT_CACHE_SIZE, ttl_seconds=max(CONTEXT_CACHE_TTL_SECONDS - 60, 0))
+_context_cache_lock = threading.Lock()
+_NOT_CACHED = object()
+
+register_cache("client", client_cache)
+register_cache("context", context_cache)
+
+def get_reasoning_engine(resource_name: str):
+    from vertexai.preview import reasoning_engines
+
+    return client_cache.get_or_create(
+        ("reasoning_engine", resource_name),
+        lambda: reasoning_engines.ReasoningEngine(resource_name)
+    )
+
+def regional_model_name(model_name: str, location: str = None) -> str:
+    """Model name that pins SDK calls to `location` instead of the vertexai.init location."""
+    project_config = get_project_config()
+    if location is None or location == project_config["location"]:
+        return model_name
+    return f"projects/{project_config['project_id']}/locations/{location}/publishers/google/models/{model_name}"
+
+def get_generative_model(model_name: str, system_instruction: str = None, location: str = None):
+    model_name = regional_model_name(model_name, location)
+
+    def build():
+        from vertexai.generative_models import GenerativeModel
+
+        if system_instruction is None:
+            return GenerativeModel(model_name)
+        return GenerativeModel(model_name, system_instruction=system_instruction)
+
+    return client_cache.get_or_create(("generative_model", model_name, system_instruction), build)
+
+def get_cached_content(model_name: str, system_instruction: str):
+    """Vertex cached-content handle holding `system_instruction`, or None if it cannot be cached.
+
+    Instructions shorter than CONTEXT_CACHE_MIN_CHARS are below the service's
+    minimum cache size and are always sent inline.
+    """
+    if not CONTEXT_CACHE_ENABLED or not system_instruction or len(system_instruction) < CONTEXT_CACHE_MIN_CHARS:
+        return None
+    key = (model_name, system_instruction)
+    cached = context_cache.get(key, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+    with _context_cache_lock:
+        cached = context_cache.get(key, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            return cached
+        try:
+            from vertexai.preview import caching
+
+            cached = caching.CachedContent.create(
+                model_name=model_name,
+                system_instruction=system_instruction,
+                ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS),
+            )
+            print(f"[CONTEXT-CACHE] Created {cached.resource_name}", flush=True)
+        except Exception as e:
+            print(f"[CONTEXT-CACHE] Caching unavailable for {model_name}, sending instructions inline: {e}", flush=True)
+            cached = None
+        context_cache.set(key, cached)
+        return cached
+
+def get_cached_model(cached_content):
+    from vertexai.preview.generative_models import GenerativeModel as PreviewGenerativeModel
+
+    return client_cache.get_or_create(
+        ("cached_model", cached_content.resource_name),
+        lambda: PreviewGenerativeModel.from_cached_content(cached_content=cached_content)
+    )
+
+def invalidate_cached_content(model_name: str, system_instruction: str):
+    cached = context_cache.get((model_name, system_instruction))
+    context_cache.invalidate((model_name, system_instruction))
+    if cached is not None:
+        client_cache.invalidate(("cached_model", cached.resource_name))
+    return cached
+
+def invalidate_reasoning_engine(resource_name: str):
+    client_cache.invalidate(("reasoning_engine", resource_name))
+
+def invalidate_system_instruction(system_instruction: str):
+    client_cache.invalidate_where(lambda key: key[0] == "generative_model" and key[2] == system_instruction)
+    for key in [k for k in context_cache.keys() if k[1] == system_instruction]:
+        cached = invalidate_cached_content(*key)
+        if cached is not None:
+            try:
+                cached.delete()
+            except Exception as e:
+                print(f"[CONTEXT-CACHE] Failed to delete {cached.resource_name}: {e}", flush=True)
@@ -0,0 +1,272 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+try:
+    from backend.config import (
+        ENGINE_POOL_SIZE,
+        ENGINE_POOL_REFILL_SECONDS,
+        ENGINE_POOL_IDLE_SECONDS,
+        get_project_config,
+    )
+except ImportError:
+    from config import (
+        ENGINE_POOL_SIZE,
+        ENGINE_POOL_REFILL_SECONDS,
+        ENGINE_POOL_IDLE_SECONDS,
+        get_project_config,
+    )
+
+STANDBY_DISPLAY_NAME = "agent-builder-standby"
+STANDBY_SYSTEM_MESSAGE = "You are a helpful AI assistant."
+
+LEADER_LEASE = "engine-pool"
+# Outlives any update of a claimed engine, after which it no longer lists as standby.
+CLAIM_LEASE_SECONDS = 24 * 3600
+
+class VertexEngineBackend:
+    """Creates and deletes generic standby engines through the Vertex AI SDK."""
+
+    def _init(self):
+        try:
+            from backend.services.sdk import init_vertexai
+        except ImportError:
+            from services.sdk import init_vertexai
+
+        project_config = get_project_config()
+        init_vertexai(project_config["project_id"], project_config["location"])
+
+    def create_standby(self) -> str:
+        from vertexai.preview import reasoning_engines
+
+        try:
+            from backend.services.rate_limit import vertex_limiter
+            from backend.services.vertex_ai import AGENT_MODEL, AGENT_MODEL_KWARGS, AGENT_REQUIREMENTS, ENGINE_ADMIN_QUOTA
+        except ImportError:
+            from services.rate_limit import vertex_limiter
+            from services.vertex_ai import AGENT_MODEL, AGENT_MODEL_KWARGS, AGENT_REQUIREMENTS, ENGINE_ADMIN_QUOTA
+
+        self._init()
+        agent = reasoning_engines.LangchainAgent(
+            model=AGENT_MODEL,
+            model_kwargs=dict(AGENT_MODEL_KWARGS),
+            runnable_kwargs={"system_message": STANDBY_SYSTEM_MESSAGE}
+        )
+        with vertex_limiter.slot(ENGINE_ADMIN_QUOTA):
+            engine = reasoning_engines.ReasoningEngine.create(
+                agent,
+                display_name=STANDBY_DISPLAY_NAME,
+                description="Pre-provisioned engine waiting to be claimed by a deployment",
+                requirements=AGENT_REQUIREMENTS,
+            )
+        return engine.resource_name
+
+    def list_standby(self) -> list:
+        from vertexai.preview import reasoning_engines
+
+        self._init()
+        engines = reasoning_engines.ReasoningEngine.list(filter=f'display_name="{STANDBY_DISPLAY_NAME}"')
+        return [engine.resource_name for engine in engines]
+
+    def delete(self, resource_name: str):
+        from vertexai.preview import reasoning_engines
+
+        self._init()
+        reasoning_engines.ReasoningEngine(resource_name).delete()
+
+class FakeEngineBackend:
+    """In-process stand-in for the reasoning-engine API, with configurable create latency."""
+
+    def __init__(self, create_seconds: float = 0.0, location: str = "us-central1"):
+        self.create_seconds = create_seconds
+        self.location = location
+        self.engines = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_standby(self) -> str:
+        time.sleep(self.create_seconds)
+        with self._lock:
+            resource_name = f"projects/fake/locations/{self.location}/reasoningEngines/{next(self._ids)}"
+            self.engines[resource_name] = STANDBY_DISPLAY_NAME
+        return resource_name
+
+    def list_standby(self) -> list:
+        with self._lock:
+            return [name for name, display in self.engines.items() if display == STANDBY_DISPLAY_NAME]
+
+    def delete(self, resource_name: str):
+        with self._lock:
+            self.engines.pop(resource_name, None)
+
+class EnginePool:
+    """Keeps up to `size` generic engines provisioned so deployments can skip ReasoningEngine.create.
+
+    A maintenance thread starts at most one creation every `refill_seconds`.
+    Standby engines unclaimed for `idle_seconds` are deleted, and the pool
+    stays dormant (no refills) until the next claim.
+
+    With a shared lease store (the sqlite deployment store), only the worker
+    process holding the leader lease adopts, refills and hands out standby
+    engines; the others always miss. Each claim also takes a per-engine lease,
+    so an engine cannot be handed out twice across a change of leader.
+    """
+
+    def __init__(self, backend, size: int = ENGINE_POOL_SIZE, refill_seconds: float = ENGINE_POOL_REFILL_SECONDS,
+                 idle_seconds: float = ENGINE_POOL_IDLE_SECONDS, leases=None):
+        self.backend = backend
+        self.leases = leases
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._leader = False
+        self.size = size
+        self.refill_seconds = refill_seconds
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._standby = []
+        self._dormant = False
+        self._last_claim = time.time()
+        self._last_create = 0.0
+        self._stats = {"claims": 0, "misses": 0, "created": 0, "reaped": 0, "create_failures": 0, "discarded": 0}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self, leases=None):
+        if not self.enabled or self._thread is not None:
+            return
+        if leases is not None:
+            self.leases = leases
+        self._thread = threading.Thread(target=self._maintain, name="engine-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self.leases is not None and self._leader:
+            self.leases.release_lease(LEADER_LEASE, self._owner)
+
+    def _adopt(self):
+        try:
+            adopted = self.backend.list_standby()
+        except Exception as e:
+            print(f"[POOL] Could not list existing standby engines: {e}", flush=True)
+            adopted = []
+        now = time.time()
+        with self._lock:
+            self._standby = [(name, now) for name in adopted]
+        if adopted:
+            print(f"[POOL] Adopted {len(adopted)} standby engines", flush=True)
+
+    def _lead(self) -> bool:
+        """Take or renew leadership; the leader re-adopts whatever standby engines exist when it takes over."""
+        if self.leases is None:
+            leader = True
+        else:
+            try:
+                leader = self.leases.acquire_lease(LEADER_LEASE, self._owner, max(3 * self.refill_seconds, 180))
+            except Exception as e:
+                print(f"[POOL] Could not renew the pool lease: {e}", flush=True)
+                leader = False
+        if leader and not self._leader:
+            self._adopt()
+        elif self._leader and not leader:
+            print("[POOL] Another worker process now runs the pool", flush=True)
+            with self._lock:
+                self._standby = []
+        self._leader = leader
+        return leader
+
+    def _take_claim(self, resource_name: str) -> bool:
+        if self.leases is None:
+            return True
+        try:
+            return self.leases.acquire_lease(f"standby:{resource_name}", self._owner, CLAIM_LEASE_SECONDS)
+        except Exception as e:
+            print(f"[POOL] Could not lease standby engine {resource_name}: {e}", flush=True)
+            return False
+
+    def claim(self) -> Optional[str]:
+        resource_name = None
+        while True:
+            with self._lock:
+                self._last_claim = time.time()
+                self._dormant = False
+                if not self._standby:
+                    break
+                candidate, _ = self._standby.pop(0)
+            if self._take_claim(candidate):
+                resource_name = candidate
+                break
+        with self._lock:
+            self._stats["claims" if resource_name else "misses"] += 1
+        self._wake.set()
+        return resource_name
+
+    def discard(self, resource_name: str):
+        """Delete a claimed engine that could not be turned into a deployment."""
+        try:
+            self.backend.delete(resource_name)
+        except Exception as e:
+            print(f"[POOL] Failed to delete discarded engine {resource_name}: {e}", flush=True)
+            return
+        with self._lock:
+            self._stats["discarded"] += 1
+        print(f"[POOL] Deleted claimed engine {resource_name} after a failed update", flush=True)
+
+    def _reap_idle(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_claim < self.idle_seconds:
+                return
+            expired = [name for name, created in self._standby if now - created > self.idle_seconds]
+            self._standby = [(name, created) for name, created in self._standby if name not in expired]
+            self._dormant = True
+        for resource_name in expired:
+            try:
+                self.backend.delete(resource_name)
+                with self._lock:
+                    self._stats["reaped"] += 1
+            except Exception as e:
+                print(f"[POOL] Failed to delete idle engine {resource_name}: {e}", flush=True)
+
+    def _refill_one(self) -> bool:
+        with self._lock:
+            if self._dormant or len(self._standby) >= self.size:
+                return False
+            if time.time() - self._last_create < self.refill_seconds:
+                return False
+            self._last_create = time.time()
+        try:
+            resource_name = self.backend.create_standby()
+        except Exception as e:
+            print(f"[POOL] Failed to create standby engine: {e}", flush=True)
+            with self._lock:
+                self._stats["create_failures"] += 1
+            return False
+        with self._lock:
+            self._standby.append((resource_name, time.time()))
+            self._stats["created"] += 1
+        print(f"[POOL] Standby engine ready: {resource_name}", flush=True)
+        return True
+
+    def _maintain(self):
+        while not self._stopped.is_set():
+            if self._lead():
+                self._reap_idle()
+                self._refill_one()
+            self._wake.wait(self.refill_seconds)
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, standby=len(self._standby), size=self.size, dormant=self._dormant,
+                        leader=self._leader)
+
+engine_pool = EnginePool(VertexEngineBackend())
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+try:
+    from backend.config import EXECUTOR_MAX_WORKERS, ENDPOINT_CONCURRENCY
+except ImportError:
+    from config import EXECUTOR_MAX_WORKERS, ENDPOINT_CONCURRENCY
+
+_executor = None
+_executor_lock = threading.Lock()
+_semaphores = {}
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="vertex-io"
+                )
+    return _executor
+
+def _get_semaphore(endpoint: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(endpoint)
+    if semaphore is None:
+        limit = ENDPOINT_CONCURRENCY.get(endpoint, ENDPOINT_CONCURRENCY["default"])
+        semaphore = asyncio.Semaphore(limit)
+        _semaphores[endpoint] = semaphore
+    return semaphore
+
+async def run_blocking(endpoint: str, func, *args, **kwargs):
+    """Run a blocking call on the shared pool, capped by the endpoint's concurrency limit."""
+    semaphore = _get_semaphore(endpoint)
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+async def stream_blocking(endpoint: str, func, *args, **kwargs):
+    """Drive a blocking generator on the shared pool and yield its items on the event loop.
+    
+    The endpoint's concurrency slot is held until the producer thread returns,
+    not just until the consumer stops iterating, so the cap counts upstream
+    streams that are still winding down after a client disconnects. When the
+    consumer stops early the producer closes the generator after its next
+    item, which runs its cleanup (limiter slot, HTTP response) straight away.
+    """
+    semaphore = _get_semaphore(endpoint)
+    await semaphore.acquire()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    stopped = threading.Event()
+    
+    def produce():
+        generator = None
+        try:
+            generator = func(*args, **kwargs)
+            for item in generator:
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (finished, e))
+            return
+        finally:
+            if generator is not None:
+                generator.close()
+        loop.call_soon_threadsafe(queue.put_nowait, (finished, None))
+    
+    try:
+        producer = loop.run_in_executor(get_executor(), produce)
+    except BaseException:
+        semaphore.release()
+        raise
+    producer.add_done_callback(lambda _: semaphore.release())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+    _semaphores.clear()
@@ -1,14 +1,44 @@
+import copy
+import hashlib
 import json
+import os
 import re
-import vertexai
-from vertexai.generative_models import GenerativeModel
+import time
 
 try:
-    from backend.config import get_project_config, STAGING_BUCKET
-    from backend.services.auth import get_credentials
+    from backend.config import (
+        get_project_config,
+        SAMPLE_PROMPTS,
+        PARSE_CACHE_SIZE,
+        PARSE_CACHE_TTL_SECONDS,
+        PARSE_CACHE_DIR,
+        PARSE_RESPONSE_SCHEMA,
+        PARSE_MAX_REPAIRS,
+    )
+    from backend.services.sdk import init_vertexai
+    from backend.services.clients import get_generative_model
+    from backend.services.cache import LRUCache
+    from backend.services.rate_limit import vertex_limiter, RateLimitExceeded, is_throttle_error
+    from backend.services.regions import region_router, is_region_failure
+    from backend.services.metrics import span, count, record_usage, register_cache
 except ImportError:
-    from config import get_project_config, STAGING_BUCKET
-    from services.auth import get_credentials
+    from config import (
+        get_project_config,
+        SAMPLE_PROMPTS,
+        PARSE_CACHE_SIZE,
+        PARSE_CACHE_TTL_SECONDS,
+        PARSE_CACHE_DIR,
+        PARSE_RESPONSE_SCHEMA,
+        PARSE_MAX_REPAIRS,
+    )
+    from services.sdk import init_vertexai
+    from services.clients import get_generative_model
+    from services.cache import LRUCache
+    from services.rate_limit import vertex_limiter, RateLimitExceeded, is_throttle_error
+    from services.regions import region_router, is_region_failure
+    from services.metrics import span, count, record_usage, register_cache
+
+PARSE_MODEL = "gemini-2.0-flash-exp"
 
 PARSING_PROMPT = """You are a configuration parser for Vertex AI agents. Parse the following user request and extract a structured JSON configuration for creating an AI agent.
 
@@ -32,48 +62,317 @@ Rules:
 - Keep the personality consistent with the user's requirements
 - Return ONLY valid JSON, nothing else"""
 
-_initialized = False
+REPAIR_PROMPT = """The JSON below was generated as an agent configuration for a user request, but it cannot be used: {error}
+
+User Request: {user_request}
+
+JSON:
+{partial}
+
+Return the complete, corrected configuration as a single JSON object with the fields {fields}. Keep every value that is already correct. Return ONLY valid JSON, nothing else."""
+
+AGENT_TYPES = ["conversational", "task-oriented", "qa", "creative", "analytical"]
+
+REQUIRED_FIELDS = ("agent_name", "agent_type", "description", "capabilities", "tools", "personality", "instructions")
+
+LIST_FIELDS = ("capabilities", "tools")
+
+# OpenAPI-subset schema passed to Gemini as response_schema so output is
+# constrained to an AgentConfig instead of free-form text.
+AGENT_CONFIG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "agent_name": {"type": "string"},
+        "agent_type": {"type": "string", "enum": AGENT_TYPES},
+        "description": {"type": "string"},
+        "capabilities": {"type": "array", "items": {"type": "string"}},
+        "tools": {"type": "array", "items": {"type": "string"}},
+        "personality": {"type": "string"},
+        "instructions": {"type": "string"},
+    },
+    "required": list(REQUIRED_FIELDS),
+}
 
 def ensure_initialized():
-    global _initialized
-    if not _initialized:
-        config = get_project_config()
-        credentials = get_credentials()
-        
-        if credentials:
-            vertexai.init(
-                project=config["project_id"],
-                location=config["location"],
-                credentials=credentials,
-                staging_bucket=STAGING_BUCKET
-            )
-        else:
-            vertexai.init(
-                project=config["project_id"],
-                location=config["location"],
-                staging_bucket=STAGING_BUCKET
-            )
-        _initialized = True
+    config = get_project_config()
+    init_vertexai(config["project_id"], config["location"])
 
-def parse_agent_requirements(user_request: str) -> dict:
-    ensure_initialized()
-    
-    model = GenerativeModel("gemini-2.0-flash-exp")
-    prompt = PARSING_PROMPT.format(user_request=user_request)
-    response = model.generate_content(prompt)
+parse_cache = LRUCache(PARSE_CACHE_SIZE, PARSE_CACHE_TTL_SECONDS)
+register_cache("parse", parse_cache)
+
+def normalize_request(user_request: str) -> str:
+    return " ".join(user_request.lower().split())
+
+def parse_cache_key(user_request: str) -> str:
+    # The prompt template and model are part of the key so edits to either
+    # invalidate previously cached results, including those on disk.
+    schema = json.dumps(AGENT_CONFIG_SCHEMA, sort_keys=True) if PARSE_RESPONSE_SCHEMA else ""
+    material = "\x00".join([PARSE_MODEL, PARSING_PROMPT, schema, normalize_request(user_request)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def _disk_cache_path(key: str) -> str:
+    return os.path.join(PARSE_CACHE_DIR, f"{key}.json")
+
+def _disk_cache_get(key: str):
+    if not PARSE_CACHE_DIR:
+        return None
+    path = _disk_cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > PARSE_CACHE_TTL_SECONDS:
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _disk_cache_put(key: str, config: dict):
+    if not PARSE_CACHE_DIR:
+        return
+    try:
+        os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+        tmp_path = _disk_cache_path(key) + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(config, f)
+        os.replace(tmp_path, _disk_cache_path(key))
+    except OSError as e:
+        print(f"[PARSE] Could not write parse cache entry: {e}")
+
+class IncrementalConfigParser:
+    """Pulls top-level fields out of a JSON object while it is still being streamed.
+
+    feed() returns the (field, value) pairs whose values completed in the new
+    text. A value is complete once the comma or closing brace after it
+    arrives. Anything before the first "{" (such as a markdown fence) is
+    skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        completed = []
+        while self._pos < len(self.text):
+            i = self._pos
+            ch = self.text[i]
+            self._pos += 1
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+            if self._depth == 0:
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(self.text[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif ch == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]" or (ch == "," and self._depth == 1):
+                if self._depth == 1 and self._value_start is not None:
+                    try:
+                        value = json.loads(self.text[self._value_start:i])
+                    except ValueError:
+                        pass
+                    else:
+                        self.fields[self._key] = value
+                        completed.append((self._key, value))
+                    self._key = None
+                    self._value_start = None
+                if ch != ",":
+                    self._depth -= 1
+        return completed
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r'^```(?:json)?\n?', '', text)
+        text = re.sub(r'\n?```$', '', text)
+    return text
+
+def _validate_config(config: dict):
+    for field in REQUIRED_FIELDS:
+        if field not in config:
+            raise ValueError(f"Missing required field: {field}")
+    for field in LIST_FIELDS:
+        if not isinstance(config[field], list):
+            raise ValueError(f"Field {field} must be a list")
+
+def _salvage_config(text: str, known: dict) -> dict:
+    """Best config recoverable from `text`, merged over fields recovered from earlier attempts.
+
+    Raises ValueError describing what is still wrong.
+    """
+    try:
+        parsed = json.loads(_strip_fences(text))
+        if not isinstance(parsed, dict):
+            raise ValueError("Response is not a JSON object")
+    except ValueError as e:
+        # Keep whatever fields did complete, e.g. before the output was truncated.
+        parser = IncrementalConfigParser()
+        parser.feed(text)
+        config = dict(known, **parser.fields)
+        _validate_config(config)
+        print(f"[PARSE] Recovered config from malformed output ({e})")
+        return config
+    config = dict(known, **parsed)
+    _validate_config(config)
+    return config
+
+def _generation_config():
+    if not PARSE_RESPONSE_SCHEMA:
+        return None
+    from vertexai.generative_models import GenerationConfig
+
+    return GenerationConfig(response_mime_type="application/json", response_schema=AGENT_CONFIG_SCHEMA)
+
+def _generate_text(prompt: str) -> str:
+    def generate(location):
+        model = get_generative_model(PARSE_MODEL, location=location)
+        with vertex_limiter.slot(PARSE_MODEL), span("parse.generate"):
+            response = model.generate_content(prompt, generation_config=_generation_config())
+        record_usage(PARSE_MODEL, getattr(response, "usage_metadata", None))
+        return response.text
     
-    response_text = response.text.strip()
+    return region_router.call(generate)
+
+def _finish_config(user_request: str, text: str, known: dict = None) -> dict:
+    """Validate generated text, asking the model to repair it at most PARSE_MAX_REPAIRS times.
+
+    Repairs are sent the previous output so the model corrects it rather than
+    starting over, and fields that already parsed are kept.
+    """
+    known = dict(known or {})
+    for attempt in range(PARSE_MAX_REPAIRS + 1):
+        try:
+            with span("parse.json_cleanup"):
+                config = _salvage_config(text, known)
+            if attempt:
+                count("parse_repair", outcome="repaired")
+            return config
+        except ValueError as e:
+            error = e
+        parser = IncrementalConfigParser()
+        parser.feed(text)
+        known.update(parser.fields)
+        if attempt == PARSE_MAX_REPAIRS:
+            break
+        print(f"[PARSE] Repairing generated config ({error})")
+        count("parse_repair", outcome="attempt")
+        text = _generate_text(REPAIR_PROMPT.format(
+            error=error,
+            user_request=user_request,
+            partial=text,
+            fields=", ".join(REQUIRED_FIELDS),
+        ))
+    count("parse_repair", outcome="failed")
+    raise error
+
+def _generate_config(user_request: str) -> dict:
+    ensure_initialized()
+    return _finish_config(user_request, _generate_text(PARSING_PROMPT.format(user_request=user_request)))
+
+def _cached_config(key: str):
+    config = parse_cache.get(key)
+    if config is None:
+        config = _disk_cache_get(key)
+        if config is not None:
+            count("parse_disk_cache_hit")
+            parse_cache.set(key, config)
+    return config
+
+def _store_config(key: str, config: dict):
+    parse_cache.set(key, config)
+    _disk_cache_put(key, config)
+
+def parse_agent_requirements(user_request: str) -> dict:
+    key = parse_cache_key(user_request)
     
-    if response_text.startswith("```"):
-        response_text = re.sub(r'^```(?:json)?\n?', '', response_text)
-        response_text = re.sub(r'\n?```$', '', response_text)
+    config = _cached_config(key)
+    if config is None:
+        config = _generate_config(user_request)
+        _store_config(key, config)
     
-    config = json.loads(response_text)
+    return copy.deepcopy(config)
+
+def stream_agent_requirements(user_request: str):
+    """Yield {"field", "value"} as each config field is generated, then {"config"}.
+
+    A field is yielded again if a repair changed it. Cached configs are
+    replayed immediately.
+    """
+    key = parse_cache_key(user_request)
     
-    required_fields = ["agent_name", "agent_type", "description", "capabilities", 
-                      "tools", "personality", "instructions"]
-    for field in required_fields:
-        if field not in config:
-            raise ValueError(f"Missing required field: {field}")
+    config = _cached_config(key)
+    if config is None:
+        ensure_initialized()
+        prompt = PARSING_PROMPT.format(user_request=user_request)
+        # A region is only abandoned for the next one before it has produced output.
+        for location in region_router.attempts():
+            parser = IncrementalConfigParser()
+            usage = None
+            started = time.perf_counter()
+            try:
+                model = get_generative_model(PARSE_MODEL, location=location)
+                with vertex_limiter.slot(PARSE_MODEL), span("parse.generate"):
+                    for chunk in model.generate_content(prompt, generation_config=_generation_config(), stream=True):
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        for field, value in parser.feed(chunk.text):
+                            yield {"field": field, "value": value}
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                # Throttling is a quota signal, not a sign the region is unhealthy.
+                if parser.text or is_throttle_error(e) or not is_region_failure(e):
+                    raise
+                region_router.record(location, time.perf_counter() - started, ok=False)
+                print(f"[PARSE] Streaming from {location} failed ({e}), failing over")
+                error = e
+                continue
+            region_router.record(location, time.perf_counter() - started, ok=True)
+            break
+        else:
+            raise error
+        record_usage(PARSE_MODEL, usage)
+        
+        config = _finish_config(user_request, parser.text, parser.fields)
+        for field, value in config.items():
+            if parser.fields.get(field, object()) != value:
+                yield {"field": field, "value": value}
+        _store_config(key, config)
+    else:
+        for field, value in config.items():
+            yield {"field": field, "value": copy.deepcopy(value)}
     
-    return config
+    yield {"config": copy.deepcopy(config)}
+
+def prewarm_parse_cache(prompts=SAMPLE_PROMPTS):
+    for prompt in prompts:
+        try:
+            parse_agent_requirements(prompt)
+        except Exception as e:
+            print(f"[PARSE] Prewarm failed for sample prompt: {e}")
+    print(f"[PARSE] Prewarmed parse cache with {len(prompts)} sample prompts")
@@ -0,0 +1,83 @@
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from backend.config import (
+        HTTP_POOL_SIZE,
+        HTTP_MAX_RETRIES,
+        HTTP_BACKOFF_SECONDS,
+        HTTP_CONNECT_TIMEOUT,
+        HTTP_READ_TIMEOUT,
+    )
+except ImportError:
+    from config import (
+        HTTP_POOL_SIZE,
+        HTTP_MAX_RETRIES,
+        HTTP_BACKOFF_SECONDS,
+        HTTP_CONNECT_TIMEOUT,
+        HTTP_READ_TIMEOUT,
+    )
+
+class _JitteredRetry(Retry):
+    """Exponential backoff with full jitter so concurrent retries do not land together."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if self.backoff_factor <= 0:
+            return backoff
+        return random.uniform(0, max(backoff, self.backoff_factor))
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Only connection failures are retried here. A 429/503 goes back to
+                # the caller so the rate limiter sees every throttle and backs off.
+                retry = _JitteredRetry(
+                    total=HTTP_MAX_RETRIES,
+                    connect=HTTP_MAX_RETRIES,
+                    read=0,
+                    status=0,
+                    allowed_methods=None,
+                    backoff_factor=HTTP_BACKOFF_SECONDS,
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE,
+                    pool_maxsize=HTTP_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def post_json(url: str, access_token: str, payload: dict, stream: bool = False, timeout=None) -> requests.Response:
+    """POST to a Vertex AI REST endpoint over the shared keep-alive pool."""
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+    }
+    return get_session().post(
+        url,
+        headers=headers,
+        json=payload,
+        stream=stream,
+        timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
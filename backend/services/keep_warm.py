@@ -0,0 +1,171 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+try:
+    from backend.config import (
+        KEEP_WARM_ENABLED,
+        KEEP_WARM_TICK_SECONDS,
+        KEEP_WARM_INTERVAL_SECONDS,
+        KEEP_WARM_COLD_AFTER_SECONDS,
+        KEEP_WARM_ACTIVE_WINDOW_SECONDS,
+        KEEP_WARM_MIN_QUERIES,
+        KEEP_WARM_MAX_PER_TICK,
+    )
+except ImportError:
+    from config import (
+        KEEP_WARM_ENABLED,
+        KEEP_WARM_TICK_SECONDS,
+        KEEP_WARM_INTERVAL_SECONDS,
+        KEEP_WARM_COLD_AFTER_SECONDS,
+        KEEP_WARM_ACTIVE_WINDOW_SECONDS,
+        KEEP_WARM_MIN_QUERIES,
+        KEEP_WARM_MAX_PER_TICK,
+    )
+
+KEEP_ALIVE_INPUT = "Reply with OK."
+LATENCY_SAMPLES = 100
+
+def _query_reasoning_engine(resource_name: str, text: str):
+    try:
+        from backend.services.clients import get_reasoning_engine
+        from backend.services.rate_limit import vertex_limiter
+        from backend.services.vertex_ai import AGENT_MODEL
+    except ImportError:
+        from services.clients import get_reasoning_engine
+        from services.rate_limit import vertex_limiter
+        from services.vertex_ai import AGENT_MODEL
+
+    with vertex_limiter.slot(AGENT_MODEL):
+        return get_reasoning_engine(resource_name).query(input=text)
+
+class _EngineActivity:
+    def __init__(self):
+        self.deployment_ids = set()
+        self.last_query = None
+        self.user_queries = deque()
+        self.cold_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.warm_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.keep_alive_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.keep_alives = 0
+
+def _summary(samples) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "max": None}
+    return {"count": len(samples), "p50": statistics.median(samples), "max": max(samples)}
+
+class KeepWarmScheduler:
+    """Tracks engine usage and pings recently active engines before they go cold.
+
+    A query counts as cold when the engine had not been queried for
+    `cold_after_seconds`; cold and warm latencies are kept separately per
+    engine so the interval can be tuned against real data. Keep-alive pings
+    keep the engine warm but their latencies are kept apart, so the cold and
+    warm samples only describe real queries. An engine is kept
+    warm while it has at least `min_queries` user queries in the last
+    `active_window_seconds`.
+    """
+
+    def __init__(self, query_engine=None, enabled: bool = KEEP_WARM_ENABLED,
+                 tick_seconds: float = KEEP_WARM_TICK_SECONDS,
+                 interval_seconds: float = KEEP_WARM_INTERVAL_SECONDS,
+                 cold_after_seconds: float = KEEP_WARM_COLD_AFTER_SECONDS,
+                 active_window_seconds: float = KEEP_WARM_ACTIVE_WINDOW_SECONDS,
+                 min_queries: int = KEEP_WARM_MIN_QUERIES,
+                 max_per_tick: int = KEEP_WARM_MAX_PER_TICK):
+        self.query_engine = query_engine
+        self.enabled = enabled
+        self.tick_seconds = tick_seconds
+        self.interval_seconds = interval_seconds
+        self.cold_after_seconds = cold_after_seconds
+        self.active_window_seconds = active_window_seconds
+        self.min_queries = min_queries
+        self.max_per_tick = max_per_tick
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record_query(self, resource_name: str, latency_seconds: float, deployment_id: str = None, source: str = "user"):
+        now = time.time()
+        with self._lock:
+            activity = self._engines.setdefault(resource_name, _EngineActivity())
+            if deployment_id:
+                activity.deployment_ids.add(deployment_id)
+            started = now - latency_seconds
+            if source == "keep_alive":
+                activity.keep_alive_latencies.append(latency_seconds)
+            else:
+                cold = activity.last_query is None or started - activity.last_query > self.cold_after_seconds
+                (activity.cold_latencies if cold else activity.warm_latencies).append(latency_seconds)
+            activity.last_query = now
+            if source == "user":
+                activity.user_queries.append(now)
+
+    def forget(self, resource_name: str):
+        with self._lock:
+            self._engines.pop(resource_name, None)
+
+    def _due_engines(self, now: float) -> list:
+        due = []
+        with self._lock:
+            for resource_name, activity in list(self._engines.items()):
+                while activity.user_queries and now - activity.user_queries[0] > self.active_window_seconds:
+                    activity.user_queries.popleft()
+                idle = now - (activity.last_query or 0)
+                if not activity.user_queries and idle > self.active_window_seconds * 2:
+                    del self._engines[resource_name]
+                    continue
+                if len(activity.user_queries) >= self.min_queries and idle >= self.interval_seconds:
+                    due.append((idle, resource_name))
+        due.sort(reverse=True)
+        return [resource_name for _, resource_name in due[:self.max_per_tick]]
+
+    def tick(self):
+        for resource_name in self._due_engines(time.time()):
+            started = time.perf_counter()
+            try:
+                self.query_engine(resource_name, KEEP_ALIVE_INPUT)
+            except Exception as e:
+                print(f"[KEEP-WARM] Keep-alive to {resource_name} failed: {e}", flush=True)
+                continue
+            self.record_query(resource_name, time.perf_counter() - started, source="keep_alive")
+            with self._lock:
+                activity = self._engines.get(resource_name)
+                if activity is not None:
+                    activity.keep_alives += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.tick_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[KEEP-WARM] Tick failed: {e}", flush=True)
+
+    def start(self):
+        if not self.enabled or self.query_engine is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {
+                resource_name: {
+                    "deployment_ids": sorted(activity.deployment_ids),
+                    "idle_seconds": now - activity.last_query if activity.last_query else None,
+                    "recent_user_queries": len(activity.user_queries),
+                    "keep_alives": activity.keep_alives,
+                    "cold_latency": _summary(activity.cold_latencies),
+                    "warm_latency": _summary(activity.warm_latencies),
+                    "keep_alive_latency": _summary(activity.keep_alive_latencies),
+                }
+                for resource_name, activity in self._engines.items()
+            }
+
+keep_warm = KeepWarmScheduler(_query_reasoning_engine)
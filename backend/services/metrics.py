@@ -0,0 +1,153 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(label_key: tuple, extra: tuple = ()) -> str:
+    pairs = label_key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in sorted(values.items()))
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Collector:
+    """Metric family whose samples are read from existing stats on every scrape."""
+
+    def __init__(self, name: str, metric_type: str, help_text: str, collect):
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return lines
+
+SPAN_SECONDS = Histogram("agent_builder_span_seconds", "Duration of instrumented backend stages")
+HTTP_REQUEST_SECONDS = Histogram("agent_builder_http_request_seconds", "API request latency by route")
+EVENTS = Counter("agent_builder_events_total", "Counted events such as test tier answers and fallbacks")
+TOKENS = Counter("agent_builder_tokens_total", "Gemini tokens reported in usage metadata")
+
+_registry = [SPAN_SECONDS, HTTP_REQUEST_SECONDS, EVENTS, TOKENS]
+_caches = {}
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+def register_cache(name: str, cache):
+    _caches[name] = cache
+
+def _cache_samples():
+    for name, cache in list(_caches.items()):
+        stats = cache.stats()
+        yield {"cache": name, "result": "hit"}, stats["hits"]
+        yield {"cache": name, "result": "miss"}, stats["misses"]
+
+register(Collector("agent_builder_cache_requests_total", "counter", "LRU cache lookups by result", _cache_samples))
+register(Collector(
+    "agent_builder_cache_entries", "gauge", "Entries currently held by each LRU cache",
+    lambda: (({"cache": name}, cache.stats()["size"]) for name, cache in list(_caches.items()))
+))
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        SPAN_SECONDS.observe(time.perf_counter() - started, stage=stage, outcome=outcome)
+
+def count(event: str, amount: float = 1, **labels):
+    EVENTS.inc(amount, event=event, **labels)
+
+def record_usage(model: str, usage):
+    """Count tokens from SDK `usage_metadata` or REST `usageMetadata`."""
+    if not usage:
+        return
+    fields = {
+        "prompt": ("prompt_token_count", "promptTokenCount"),
+        "candidates": ("candidates_token_count", "candidatesTokenCount"),
+        "cached": ("cached_content_token_count", "cachedContentTokenCount"),
+    }
+    for kind, names in fields.items():
+        for name in names:
+            value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+            if value:
+                TOKENS.inc(value, model=model, kind=kind)
+                break
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
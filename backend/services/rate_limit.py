@@ -0,0 +1,255 @@
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from backend.config import (
+        RATE_LIMIT_ENABLED,
+        RATE_LIMIT_PROJECT_RPM,
+        RATE_LIMIT_MODEL_RPM,
+        RATE_LIMIT_MAX_CONCURRENCY,
+        RATE_LIMIT_MIN_CONCURRENCY,
+        RATE_LIMIT_MAX_WAIT_SECONDS,
+        get_project_config,
+    )
+    from backend.services.metrics import SPAN_SECONDS, register, Collector
+except ImportError:
+    from config import (
+        RATE_LIMIT_ENABLED,
+        RATE_LIMIT_PROJECT_RPM,
+        RATE_LIMIT_MODEL_RPM,
+        RATE_LIMIT_MAX_CONCURRENCY,
+        RATE_LIMIT_MIN_CONCURRENCY,
+        RATE_LIMIT_MAX_WAIT_SECONDS,
+        get_project_config,
+    )
+    from services.metrics import SPAN_SECONDS, register, Collector
+
+THROTTLE_STATUSES = (429, 503)
+THROTTLE_ERRORS = ("ResourceExhausted", "ServiceUnavailable", "TooManyRequests")
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+class RateLimitExceeded(Exception):
+    pass
+
+class QueueTimer:
+    def __init__(self):
+        self.seconds = 0.0
+
+_queue_timers = threading.local()
+
+@contextmanager
+def queue_timer():
+    """Add up the time this thread spends waiting for limiter slots inside the block."""
+    timer = QueueTimer()
+    previous = getattr(_queue_timers, "timer", None)
+    _queue_timers.timer = timer
+    try:
+        yield timer
+    finally:
+        _queue_timers.timer = previous
+
+def is_throttle_error(error: Exception) -> bool:
+    if type(error).__name__ in THROTTLE_ERRORS:
+        return True
+    return getattr(error, "code", None) in THROTTLE_STATUSES
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`.
+
+    reserve() always takes a token and returns how long the caller must wait
+    for it, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def drain(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0)
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: +1/limit per success, halved on a throttled response."""
+
+    def __init__(self, maximum: int, minimum: int):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout=max(timeout, 0)):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled: bool):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # One burst of 429s should halve the limit once, not once per request.
+                if now - self._last_decrease > DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+class _Observation:
+    def __init__(self):
+        self.throttled = False
+
+    def record_status(self, status_code: int):
+        if status_code in THROTTLE_STATUSES:
+            self.throttled = True
+
+class RateLimiter:
+    """Shared throttle for Vertex AI calls.
+
+    Each call takes a token from its project's bucket and its model's bucket
+    and a slot from the model's adaptive concurrency limit. Calls that would
+    wait longer than `max_wait_seconds` fail fast with RateLimitExceeded.
+    """
+
+    def __init__(self, enabled: bool = RATE_LIMIT_ENABLED, project_rpm: float = RATE_LIMIT_PROJECT_RPM,
+                 model_rpm: float = RATE_LIMIT_MODEL_RPM, max_concurrency: int = RATE_LIMIT_MAX_CONCURRENCY,
+                 min_concurrency: int = RATE_LIMIT_MIN_CONCURRENCY, max_wait_seconds: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+        self.enabled = enabled
+        self.project_rpm = project_rpm
+        self.model_rpm = model_rpm
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._concurrency = {}
+        self._stats = {}
+
+    def _bucket(self, key, rpm: float) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = rpm / 60.0
+                bucket = self._buckets[key] = TokenBucket(rate, max(1.0, rate))
+            return bucket
+
+    def _limits(self, project: str, model: str):
+        key = (project, model)
+        with self._lock:
+            concurrency = self._concurrency.get(key)
+            if concurrency is None:
+                concurrency = self._concurrency[key] = AdaptiveConcurrency(self.max_concurrency, self.min_concurrency)
+                self._stats[key] = {"calls": 0, "throttled": 0, "rejected": 0,
+                                    "queue_seconds_total": 0.0, "queue_seconds_max": 0.0}
+        return (self._bucket(("project", project), self.project_rpm),
+                self._bucket(("model", project, model), self.model_rpm),
+                concurrency)
+
+    def _record(self, key, **changes):
+        with self._lock:
+            stats = self._stats[key]
+            for name, value in changes.items():
+                if name == "queue_seconds":
+                    stats["queue_seconds_total"] += value
+                    stats["queue_seconds_max"] = max(stats["queue_seconds_max"], value)
+                else:
+                    stats[name] += value
+
+    @contextmanager
+    def slot(self, model: str, project: str = None):
+        """Hold a rate-limited slot for one call to `model`.
+
+        Yields an observation: call record_status() with the HTTP status of a
+        REST response. SDK exceptions are inspected automatically.
+        """
+        observation = _Observation()
+        if not self.enabled:
+            yield observation
+            return
+
+        project = project or get_project_config()["project_id"]
+        key = (project, model)
+        project_bucket, model_bucket, concurrency = self._limits(project, model)
+
+        started = time.monotonic()
+        wait = max(project_bucket.reserve(), model_bucket.reserve())
+        if wait > self.max_wait_seconds:
+            project_bucket.refund()
+            model_bucket.refund()
+            self._record(key, rejected=1)
+            raise RateLimitExceeded(f"Rate limit for {model} would delay this call by {wait:.1f}s")
+        time.sleep(wait)
+        if not concurrency.acquire(self.max_wait_seconds - (time.monotonic() - started)):
+            project_bucket.refund()
+            model_bucket.refund()
+            self._record(key, rejected=1)
+            raise RateLimitExceeded(f"Timed out waiting for a {model} concurrency slot")
+        queue_seconds = time.monotonic() - started
+        timer = getattr(_queue_timers, "timer", None)
+        if timer is not None:
+            timer.seconds += queue_seconds
+        self._record(key, calls=1, queue_seconds=queue_seconds)
+        SPAN_SECONDS.observe(queue_seconds, stage="rate_limit.queue", outcome="ok")
+
+        try:
+            yield observation
+        except Exception as e:
+            if is_throttle_error(e):
+                observation.throttled = True
+            raise
+        finally:
+            concurrency.release(observation.throttled)
+            if observation.throttled:
+                project_bucket.drain()
+                model_bucket.drain()
+                self._record(key, throttled=1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                f"{project}/{model}": dict(
+                    self._stats[(project, model)],
+                    concurrency_limit=int(concurrency.limit),
+                    in_flight=concurrency.in_flight,
+                )
+                for (project, model), concurrency in self._concurrency.items()
+            }
+
+vertex_limiter = RateLimiter()
+
+def _limiter_samples(*fields):
+    for key, stats in vertex_limiter.stats().items():
+        for field in fields:
+            yield {"key": key, "result": field}, stats[field]
+
+register(Collector(
+    "agent_builder_rate_limit_calls_total", "counter", "Rate-limited Vertex calls by outcome",
+    lambda: _limiter_samples("calls", "throttled", "rejected")
+))
+register(Collector(
+    "agent_builder_rate_limit_concurrency", "gauge", "Adaptive concurrency limit per project/model",
+    lambda: (({"key": key}, stats["concurrency_limit"]) for key, stats in vertex_limiter.stats().items())
+))
@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+from collections import deque
+
+try:
+    from backend.config import (
+        REGION_WINDOW_SECONDS,
+        REGION_EJECT_AFTER_FAILURES,
+        REGION_EJECT_SECONDS,
+        REGION_MAX_ATTEMPTS,
+        REGION_PROBE_FRACTION,
+        get_project_config,
+    )
+    from backend.services.rate_limit import RateLimitExceeded, is_throttle_error
+    from backend.services.metrics import register, Collector
+except ImportError:
+    from config import (
+        REGION_WINDOW_SECONDS,
+        REGION_EJECT_AFTER_FAILURES,
+        REGION_EJECT_SECONDS,
+        REGION_MAX_ATTEMPTS,
+        REGION_PROBE_FRACTION,
+        get_project_config,
+    )
+    from services.rate_limit import RateLimitExceeded, is_throttle_error
+    from services.metrics import register, Collector
+
+REGION_FAILURE_STATUSES = (429, 500, 502, 503, 504)
+REGION_FAILURE_ERRORS = ("ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "ConnectionError",
+                         "ConnectTimeout", "ReadTimeout", "Timeout")
+LATENCY_SMOOTHING = 0.2
+# Each point of error rate weighs like this many times the region's latency.
+ERROR_PENALTY = 4.0
+
+class RegionUnavailable(Exception):
+    """A regional endpoint answered with a status that another region might not."""
+
+    def __init__(self, location: str, code: int):
+        super().__init__(f"{location} returned HTTP {code}")
+        self.location = location
+        self.code = code
+
+def is_region_failure(error: Exception) -> bool:
+    if isinstance(error, (RegionUnavailable, ConnectionError, TimeoutError)) or is_throttle_error(error):
+        return True
+    if type(error).__name__ in REGION_FAILURE_ERRORS:
+        return True
+    return getattr(error, "code", None) in REGION_FAILURE_STATUSES
+
+class _RegionStats:
+    def __init__(self):
+        self.latency = None
+        self.outcomes = deque()
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def prune(self, now: float, window_seconds: float):
+        while self.outcomes and now - self.outcomes[0][0] > window_seconds:
+            self.outcomes.popleft()
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+class RegionRouter:
+    """Orders the configured Vertex AI locations by recent latency and error rate.
+
+    Regions are scored by smoothed latency, inflated by their error rate over
+    the last `window_seconds`. A region that fails `eject_after` times in a
+    row goes to the back of the list for `eject_seconds`. Regions with no
+    samples yet score zero, so they are tried early. A small fraction of calls
+    go to a random other region first, which keeps every region's stats fresh.
+    """
+
+    def __init__(self, window_seconds: float = REGION_WINDOW_SECONDS, eject_after: int = REGION_EJECT_AFTER_FAILURES,
+                 eject_seconds: float = REGION_EJECT_SECONDS, max_attempts: int = REGION_MAX_ATTEMPTS,
+                 probe_fraction: float = REGION_PROBE_FRACTION, locations=None, seed: int = None):
+        self.window_seconds = window_seconds
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_attempts = max_attempts
+        self.probe_fraction = probe_fraction
+        self._locations = locations
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def locations(self) -> list:
+        return list(self._locations) if self._locations else get_project_config()["locations"]
+
+    def _region(self, location: str) -> _RegionStats:
+        region = self._stats.get(location)
+        if region is None:
+            region = self._stats[location] = _RegionStats()
+        return region
+
+    def ranked(self, probe: bool = False) -> list:
+        """All configured locations, best first; `probe` allows the occasional exploratory reorder."""
+        locations = self.locations()
+        if len(locations) == 1:
+            return locations
+        now = time.time()
+        with self._lock:
+            def score(location):
+                region = self._region(location)
+                region.prune(now, self.window_seconds)
+                ejected = region.ejected_until > now
+                if region.latency is None:
+                    # Untried regions go first; ones that have only ever failed go last.
+                    return (ejected, float("inf") if region.failures else 0.0)
+                return (ejected, region.latency * (1 + ERROR_PENALTY * region.error_rate()))
+
+            ranked = sorted(locations, key=score)
+            if probe and self._random.random() < self.probe_fraction:
+                ranked.insert(0, ranked.pop(self._random.randrange(1, len(ranked))))
+        return ranked
+
+    def attempts(self) -> list:
+        """Locations to try for one call, in order."""
+        return self.ranked(probe=True)[:max(1, self.max_attempts)]
+
+    def record(self, location: str, latency_seconds: float, ok: bool):
+        now = time.time()
+        with self._lock:
+            region = self._region(location)
+            region.requests += 1
+            region.outcomes.append((now, ok))
+            region.prune(now, self.window_seconds)
+            if ok:
+                region.consecutive_failures = 0
+                if region.latency is None:
+                    region.latency = latency_seconds
+                else:
+                    region.latency += LATENCY_SMOOTHING * (latency_seconds - region.latency)
+            else:
+                region.failures += 1
+                region.consecutive_failures += 1
+                if region.consecutive_failures >= self.eject_after:
+                    region.ejected_until = now + self.eject_seconds
+                    region.consecutive_failures = 0
+                    print(f"[REGIONS] Ejecting {location} for {self.eject_seconds:.0f}s after repeated failures", flush=True)
+
+    def call(self, func):
+        """Return func(location) from the first region that does not fail with a regional error.
+
+        Other errors, throttles (429/503) and RateLimitExceeded from the local
+        limiter are raised straight away because another region would not fix them.
+        """
+        error = None
+        for location in self.attempts():
+            started = time.perf_counter()
+            try:
+                result = func(location)
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                if not is_region_failure(e):
+                    raise
+                self.record(location, time.perf_counter() - started, ok=False)
+                if is_throttle_error(e):
+                    # Every region draws on the same project quota and limiter buckets.
+                    raise
+                print(f"[REGIONS] {location} failed ({e}), failing over", flush=True)
+                error = e
+                continue
+            self.record(location, time.perf_counter() - started, ok=True)
+            return result
+        raise error
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            stats = {}
+            for location in self.locations():
+                region = self._region(location)
+                region.prune(now, self.window_seconds)
+                stats[location] = {
+                    "latency_ms": None if region.latency is None else region.latency * 1000,
+                    "error_rate": region.error_rate(),
+                    "requests": region.requests,
+                    "failures": region.failures,
+                    "ejected": region.ejected_until > now,
+                }
+            return stats
+
+region_router = RegionRouter()
+
+register(Collector(
+    "agent_builder_region_latency_seconds", "gauge", "Smoothed latency of successful calls per Vertex AI region",
+    lambda: (({"location": location}, stats["latency_ms"] / 1000)
+             for location, stats in region_router.stats().items() if stats["latency_ms"] is not None)
+))
+register(Collector(
+    "agent_builder_region_requests_total", "counter", "Routed Vertex AI calls per region and outcome",
+    lambda: (sample for location, stats in region_router.stats().items() for sample in (
+        ({"location": location, "result": "ok"}, stats["requests"] - stats["failures"]),
+        ({"location": location, "result": "failed"}, stats["failures"]),
+    ))
+))
@@ -0,0 +1,137 @@
+import threading
+from collections import Counter
+from typing import Optional
+
+try:
+    from backend.config import DEPLOY_WORKERS, DEPLOY_QUEUE_SIZE, DEPLOY_PROJECT_CONCURRENCY
+except ImportError:
+    from config import DEPLOY_WORKERS, DEPLOY_QUEUE_SIZE, DEPLOY_PROJECT_CONCURRENCY
+
+class QueueFullError(Exception):
+    pass
+
+class _Job:
+    def __init__(self, job_id: str, project_id: str, func, args):
+        self.id = job_id
+        self.project_id = project_id
+        self.func = func
+        self.args = args
+        self.cancelled = threading.Event()
+
+class JobScheduler:
+    """Bounded FIFO job queue drained by a fixed pool of worker threads.
+
+    At most `per_project_limit` jobs for the same project run at once; jobs
+    for a saturated project stay queued while later jobs for other projects
+    are started.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, per_project_limit: int, name: str = "job"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.per_project_limit = per_project_limit
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending = []
+        self._running = {}
+        self._project_running = Counter()
+        self._workers = []
+        self._shutdown = False
+
+    def _ensure_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"{self.name}-worker-{len(self._workers)}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, job_id: str, project_id: str, func, *args):
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler is shut down")
+            if len(self._pending) >= self.max_queue:
+                raise QueueFullError(f"Queue is full ({self.max_queue} jobs waiting)")
+            self._pending.append(_Job(job_id, project_id, func, args))
+            self._ensure_workers()
+            self._cond.notify()
+
+    def _next_job(self):
+        for index, job in enumerate(self._pending):
+            if self._project_running[job.project_id] < self.per_project_limit:
+                return self._pending.pop(index)
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                self._running[job.id] = job
+                self._project_running[job.project_id] += 1
+
+            try:
+                job.func(*job.args)
+            except Exception as e:
+                print(f"[SCHEDULER] Job {job.id[:8]} failed: {e}", flush=True)
+            finally:
+                with self._cond:
+                    self._running.pop(job.id, None)
+                    self._project_running[job.project_id] -= 1
+                    self._cond.notify_all()
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position in the wait queue, or None if the job is not waiting."""
+        with self._cond:
+            for index, job in enumerate(self._pending):
+                if job.id == job_id:
+                    return index + 1
+        return None
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job. Returns "pending" or "running" for the state it was in, or None if unknown."""
+        with self._cond:
+            for index, job in enumerate(self._pending):
+                if job.id == job_id:
+                    del self._pending[index]
+                    job.cancelled.set()
+                    return "pending"
+            job = self._running.get(job_id)
+            if job is not None:
+                job.cancelled.set()
+                return "running"
+        return None
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._cond:
+            job = self._running.get(job_id)
+        return job is not None and job.cancelled.is_set()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.max_workers,
+                "queued": len(self._pending),
+                "running": len(self._running),
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+deployment_scheduler = JobScheduler(
+    max_workers=DEPLOY_WORKERS,
+    max_queue=DEPLOY_QUEUE_SIZE,
+    per_project_limit=DEPLOY_PROJECT_CONCURRENCY,
+    name="deploy"
+)
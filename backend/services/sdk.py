@@ -0,0 +1,68 @@
+import importlib
+import threading
+
+try:
+    from backend.config import STAGING_BUCKET
+    from backend.services.auth import get_credentials
+    from backend.services.clients import client_cache, context_cache
+    from backend.services.metrics import span
+except ImportError:
+    from config import STAGING_BUCKET
+    from services.auth import get_credentials
+    from services.clients import client_cache, context_cache
+    from services.metrics import span
+
+# Modules that dominate the first deploy/parse/test call when imported lazily.
+SDK_MODULES = (
+    "google.auth.transport.requests",
+    "google.oauth2.service_account",
+    "vertexai",
+    "vertexai.generative_models",
+    "vertexai.preview.generative_models",
+    "vertexai.preview.caching",
+    "vertexai.preview.reasoning_engines",
+)
+
+_init_lock = threading.Lock()
+_init_key = None
+
+def prewarm_sdk():
+    """Import the Vertex AI SDK ahead of the first request that needs it."""
+    with span("sdk.import"):
+        for module in SDK_MODULES:
+            importlib.import_module(module)
+
+def init_vertexai(project_id: str, location: str):
+    """Initialize the global Vertex AI SDK state, skipping the call if nothing changed.
+
+    vertexai.init mutates process-wide state, so concurrent deploy and parse
+    threads go through this lock instead of calling it directly.
+    """
+    global _init_key
+    import vertexai
+
+    credentials = get_credentials()
+    key = (project_id, location, id(credentials) if credentials else None)
+
+    with _init_lock:
+        if _init_key == key:
+            return
+
+        with span("vertexai.init"):
+            if credentials:
+                vertexai.init(
+                    project=project_id,
+                    location=location,
+                    credentials=credentials,
+                    staging_bucket=STAGING_BUCKET
+                )
+            else:
+                vertexai.init(
+                    project=project_id,
+                    location=location,
+                    staging_bucket=STAGING_BUCKET
+                )
+        if _init_key is not None:
+            client_cache.clear()
+            context_cache.clear()
+        _init_key = key
@@ -0,0 +1,346 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    from backend.config import (
+        DEPLOYMENT_STORE,
+        DEPLOYMENT_STORE_PATH,
+        DEPLOYMENT_STORE_MAX_ENTRIES,
+        DEPLOYMENT_TTL_SECONDS,
+    )
+except ImportError:
+    from config import (
+        DEPLOYMENT_STORE,
+        DEPLOYMENT_STORE_PATH,
+        DEPLOYMENT_STORE_MAX_ENTRIES,
+        DEPLOYMENT_TTL_SECONDS,
+    )
+
+TERMINAL_STATUSES = ("completed", "error", "cancelled", "superseded")
+
+INDEXED_FIELDS = ("config_hash", "display_name", "resource_name")
+
+# How often the sqlite store prunes expired and excess finished records.
+PURGE_INTERVAL_SECONDS = 60
+
+class DeploymentStore(ABC):
+    """Interface for deployment records. Records are plain JSON-serializable dicts.
+
+    Every put/update bumps the record's integer `version`, which callers use
+    to tell whether anything changed since they last read it.
+    """
+
+    @abstractmethod
+    def get(self, deployment_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put(self, deployment_id: str, record: dict):
+        ...
+
+    @abstractmethod
+    def update(self, deployment_id: str, **changes) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def delete(self, deployment_id: str):
+        ...
+
+    @abstractmethod
+    def list_ids(self, statuses=None) -> list:
+        ...
+
+    @abstractmethod
+    def find(self, field: str, value, statuses=None) -> list:
+        """Records whose top-level `field` equals `value`, most recently updated first."""
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take or renew the named lease for `owner`; False while another owner holds an unexpired one."""
+        ...
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str):
+        ...
+
+    def __contains__(self, deployment_id: str) -> bool:
+        return self.get(deployment_id) is not None
+
+def _is_expired(record: dict, ttl_seconds: float, now: float) -> bool:
+    return record.get("status") in TERMINAL_STATUSES and now - record.get("updated_at", now) > ttl_seconds
+
+class MemoryDeploymentStore(DeploymentStore):
+    """LRU-bounded in-process store; finished records also expire after a TTL.
+
+    Records that are still pending or in progress are never evicted.
+    """
+
+    def __init__(self, max_entries: int = DEPLOYMENT_STORE_MAX_ENTRIES, ttl_seconds: float = DEPLOYMENT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._leases = {}
+
+    def _evict(self, now: float):
+        for deployment_id in [k for k, r in self._records.items() if _is_expired(r, self.ttl_seconds, now)]:
+            del self._records[deployment_id]
+
+        overflow = len(self._records) - self.max_entries
+        if overflow <= 0:
+            return
+        for deployment_id in [k for k, r in self._records.items() if r.get("status") in TERMINAL_STATUSES][:overflow]:
+            del self._records[deployment_id]
+
+    def get(self, deployment_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(deployment_id)
+            if record is None:
+                return None
+            if _is_expired(record, self.ttl_seconds, time.time()):
+                del self._records[deployment_id]
+                return None
+            self._records.move_to_end(deployment_id)
+            return dict(record)
+
+    def put(self, deployment_id: str, record: dict):
+        now = time.time()
+        with self._lock:
+            previous = self._records.get(deployment_id, {})
+            self._records[deployment_id] = dict(record, updated_at=now, version=previous.get("version", 0) + 1)
+            self._records.move_to_end(deployment_id)
+            self._evict(now)
+
+    def update(self, deployment_id: str, **changes) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(deployment_id)
+            if record is None:
+                return None
+            record.update(changes, updated_at=time.time(), version=record.get("version", 0) + 1)
+            self._records.move_to_end(deployment_id)
+            return dict(record)
+
+    def delete(self, deployment_id: str):
+        with self._lock:
+            self._records.pop(deployment_id, None)
+
+    def list_ids(self, statuses=None) -> list:
+        with self._lock:
+            return [k for k, r in self._records.items() if statuses is None or r.get("status") in statuses]
+
+    def find(self, field: str, value, statuses=None) -> list:
+        now = time.time()
+        with self._lock:
+            matches = [
+                dict(r) for r in self._records.values()
+                if r.get(field) == value
+                and (statuses is None or r.get("status") in statuses)
+                and not _is_expired(r, self.ttl_seconds, now)
+            ]
+        return sorted(matches, key=lambda r: r["updated_at"], reverse=True)
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder is not None and holder[0] != owner and holder[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl_seconds)
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+class SqliteDeploymentStore(DeploymentStore):
+    """SQLite-backed store shared by every worker process on the host and kept across restarts.
+
+    Writes go through one connection guarded by a lock and run in immediate
+    transactions. Reads use a per-thread connection and never take that lock;
+    under WAL they see the last committed state without waiting for writers.
+    """
+
+    def __init__(self, path: str = DEPLOYMENT_STORE_PATH, max_entries: int = DEPLOYMENT_STORE_MAX_ENTRIES,
+                 ttl_seconds: float = DEPLOYMENT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS deployments ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " record TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_deployments_status_updated ON deployments (status, updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        for field in INDEXED_FIELDS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_deployments_{field} ON deployments (json_extract(record, '$.{field}'))"
+            )
+        self.purge()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return conn
+
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func()
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def purge(self):
+        """Drop expired finished records and leases, then the oldest finished records beyond `max_entries`.
+
+        Records that are still pending or in progress are never removed.
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in TERMINAL_STATUSES)
+
+        def purge():
+            self._conn.execute(
+                f"DELETE FROM deployments WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, now - self.ttl_seconds)
+            )
+            self._conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM deployments").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM deployments WHERE id IN (SELECT id FROM deployments WHERE status IN ({placeholders})"
+                    " ORDER BY updated_at LIMIT ?)",
+                    (*TERMINAL_STATUSES, overflow)
+                )
+
+        self._transaction(purge)
+        self._last_purge = now
+
+    def get(self, deployment_id: str) -> Optional[dict]:
+        row = self._reader().execute(
+            "SELECT record FROM deployments WHERE id = ?", (deployment_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if _is_expired(record, self.ttl_seconds, time.time()):
+            self.delete(deployment_id)
+            return None
+        return record
+
+    def _write(self, deployment_id: str, record: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO deployments (id, status, updated_at, record) VALUES (?, ?, ?, ?)",
+            (deployment_id, record.get("status", ""), record["updated_at"], json.dumps(record))
+        )
+
+    def put(self, deployment_id: str, record: dict):
+        # The version read and the write share one transaction, so two processes
+        # putting the same id cannot both write the same version.
+        def put():
+            row = self._conn.execute(
+                "SELECT json_extract(record, '$.version') FROM deployments WHERE id = ?", (deployment_id,)
+            ).fetchone()
+            self._write(deployment_id, dict(record, updated_at=time.time(), version=(row[0] or 0) + 1 if row else 1))
+
+        self._transaction(put)
+        if time.time() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self.purge()
+
+    def update(self, deployment_id: str, **changes) -> Optional[dict]:
+        def update():
+            row = self._conn.execute(
+                "SELECT record FROM deployments WHERE id = ?", (deployment_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row[0])
+            record.update(changes, updated_at=time.time(), version=record.get("version", 0) + 1)
+            self._write(deployment_id, record)
+            return record
+
+        return self._transaction(update)
+
+    def delete(self, deployment_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM deployments WHERE id = ?", (deployment_id,))
+
+    def list_ids(self, statuses=None) -> list:
+        if statuses is None:
+            rows = self._reader().execute("SELECT id FROM deployments ORDER BY updated_at").fetchall()
+        else:
+            statuses = list(statuses)
+            placeholders = ",".join("?" for _ in statuses)
+            rows = self._reader().execute(
+                f"SELECT id FROM deployments WHERE status IN ({placeholders}) ORDER BY updated_at",
+                statuses
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def find(self, field: str, value, statuses=None) -> list:
+        if not re.fullmatch(r"[a-z_]+", field):
+            raise ValueError(f"Invalid field name: {field}")
+        query = f"SELECT record FROM deployments WHERE json_extract(record, '$.{field}') = ?"
+        params = [value]
+        if statuses is not None:
+            statuses = list(statuses)
+            query += f" AND status IN ({','.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        query += " ORDER BY updated_at DESC"
+        rows = self._reader().execute(query, params).fetchall()
+        now = time.time()
+        records = [json.loads(row[0]) for row in rows]
+        return [r for r in records if not _is_expired(r, self.ttl_seconds, now)]
+
+    def acquire_lease(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        def acquire():
+            now = time.time()
+            row = self._conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl_seconds)
+            )
+            return True
+
+        return self._transaction(acquire)
+
+    def release_lease(self, name: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+def create_deployment_store(kind: str = DEPLOYMENT_STORE) -> DeploymentStore:
+    if kind == "sqlite":
+        return SqliteDeploymentStore()
+    if kind == "memory":
+        return MemoryDeploymentStore()
+    raise ValueError(f"Unknown DEPLOYMENT_STORE backend: {kind}")
@@ -1,24 +1,126 @@
+import hashlib
+import json
+import os
 import time
 import uuid
-import requests
-import vertexai
-from vertexai.preview import reasoning_engines
-from vertexai.generative_models import GenerativeModel
 
 try:
-    from backend.config import get_project_config, STAGING_BUCKET
-    from backend.services.auth import get_credentials, get_access_token
+    from backend.config import (
+        get_project_config,
+        vertex_api_base_url,
+        DEPLOY_DEDUPE,
+        CONTEXT_CACHE_MODEL,
+        TEST_CACHE_ENABLED,
+        TEST_CACHE_SIZE,
+        TEST_CACHE_TTL_SECONDS,
+        TEST_COALESCE,
+    )
+    from backend.services.auth import get_access_token
+    from backend.services.events import deployment_events
+    from backend.services.scheduler import deployment_scheduler
+    from backend.services.sdk import init_vertexai
+    from backend.services.store import create_deployment_store
+    from backend.services.http import post_json
+    from backend.services.engine_pool import engine_pool
+    from backend.services.keep_warm import keep_warm
+    from backend.services.cache import LRUCache, SingleFlight
+    from backend.services.rate_limit import vertex_limiter, RateLimitExceeded, is_throttle_error, THROTTLE_STATUSES
+    from backend.services.regions import region_router, is_region_failure, RegionUnavailable, REGION_FAILURE_STATUSES
+    from backend.services.metrics import SPAN_SECONDS, span, count, record_usage, register, register_cache, Collector
+    from backend.services.clients import (
+        get_reasoning_engine,
+        get_generative_model,
+        get_cached_content,
+        get_cached_model,
+        invalidate_cached_content,
+        invalidate_reasoning_engine,
+        invalidate_system_instruction,
+    )
 except ImportError:
-    from config import get_project_config, STAGING_BUCKET
-    from services.auth import get_credentials, get_access_token
+    from config import (
+        get_project_config,
+        vertex_api_base_url,
+        DEPLOY_DEDUPE,
+        CONTEXT_CACHE_MODEL,
+        TEST_CACHE_ENABLED,
+        TEST_CACHE_SIZE,
+        TEST_CACHE_TTL_SECONDS,
+        TEST_COALESCE,
+    )
+    from services.auth import get_access_token
+    from services.events import deployment_events
+    from services.scheduler import deployment_scheduler
+    from services.sdk import init_vertexai
+    from services.store import create_deployment_store
+    from services.http import post_json
+    from services.engine_pool import engine_pool
+    from services.keep_warm import keep_warm
+    from services.cache import LRUCache, SingleFlight
+    from services.rate_limit import vertex_limiter, RateLimitExceeded, is_throttle_error, THROTTLE_STATUSES
+    from services.regions import region_router, is_region_failure, RegionUnavailable, REGION_FAILURE_STATUSES
+    from services.metrics import SPAN_SECONDS, span, count, record_usage, register, register_cache, Collector
+    from services.clients import (
+        get_reasoning_engine,
+        get_generative_model,
+        get_cached_content,
+        get_cached_model,
+        invalidate_cached_content,
+        invalidate_reasoning_engine,
+        invalidate_system_instruction,
+    )
+
+deployment_store = create_deployment_store()
+
+test_response_cache = LRUCache(TEST_CACHE_SIZE, TEST_CACHE_TTL_SECONDS)
+test_flights = SingleFlight()
+
+register_cache("test_response", test_response_cache)
+register(Collector(
+    "agent_builder_test_coalesced_total", "counter", "/api/test calls that shared an in-flight identical request",
+    lambda: [({}, test_flights.stats()["shared"])]
+))
+
+TEST_ERROR_PREFIX = "Error testing agent: "
+
+AGENT_MODEL = "gemini-2.0-flash"
 
-deployments = {}
+TEST_MODEL = "gemini-2.0-flash-exp"
+
+ENGINE_ADMIN_QUOTA = "reasoning_engines"
+
+# Held (in the shared store) while a deployment replaces an engine's contents.
+ENGINE_LEASE_SECONDS = 1800
+ENGINE_LEASE_POLL_SECONDS = 2.0
+
+AGENT_MODEL_KWARGS = {
+    "temperature": 0.7,
+    "max_output_tokens": 2048,
+}
+
+AGENT_REQUIREMENTS = [
+    "google-cloud-aiplatform[langchain,agent_engines]>=1.72.0",
+    "cloudpickle==3.0.0",
+    "langchain>=0.3.0,<0.4.0",
+    "langchain-google-vertexai>=2.0.0,<3.0.0",
+    "pydantic>=2.10",
+]
 
 class DeploymentStatus:
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     ERROR = "error"
+    CANCELLED = "cancelled"
+    SUPERSEDED = "superseded"
+
+class DeploymentPhase:
+    INITIALIZING = "initializing"
+    BUILDING_AGENT = "building_agent"
+    UPLOADING = "uploading"
+    VALIDATING = "validating"
+
+class DeploymentCancelled(Exception):
+    pass
 
 def create_system_message(config: dict) -> str:
     return f"""{config["instructions"]}
@@ -73,31 +175,222 @@ Respond to the following user input:"""
         return response.text
 '''
 
-def start_deployment(config: dict) -> str:
+def effective_config_hash(config: dict, project_config: dict) -> str:
+    """Hash of everything that determines the behaviour of the deployed engine."""
+    effective = {
+        "project_id": project_config["project_id"],
+        "location": project_config["location"],
+        "display_name": config["agent_name"],
+        "system_message": create_system_message(config),
+        "model": AGENT_MODEL,
+        "model_kwargs": AGENT_MODEL_KWARGS,
+        "requirements": AGENT_REQUIREMENTS,
+    }
+    canonical = json.dumps(effective, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _find_reusable_deployment(config_hash: str):
+    for deployment in deployment_store.find("config_hash", config_hash, statuses=(DeploymentStatus.COMPLETED,)):
+        if deployment.get("resource_name"):
+            return deployment
+    return None
+
+def _replaceable_deployment(deployment_id: str, location: str) -> dict:
+    deployment = deployment_store.get(deployment_id)
+    if deployment is None:
+        raise ValueError(f"Deployment {deployment_id} not found")
+    if deployment["status"] == DeploymentStatus.SUPERSEDED:
+        raise ValueError(f"Deployment {deployment_id} was already replaced by {deployment.get('superseded_by')}")
+    if deployment["status"] != DeploymentStatus.COMPLETED or not deployment.get("resource_name"):
+        raise ValueError(f"Deployment {deployment_id} is not complete")
+    if f"/locations/{location}/" not in deployment["resource_name"]:
+        raise ValueError(f"Deployment {deployment_id} is in another location")
+    return deployment
+
+def start_deployment(config: dict, replaces: str = None) -> str:
+    """Queue a deployment of `config`.
+
+    With `replaces`, the worker updates that completed deployment's engine in
+    place instead of creating a new one, and marks it superseded. Raises
+    ValueError if it cannot be replaced.
+    """
     deployment_id = str(uuid.uuid4())
+    project_config = get_project_config()
+    project_id = project_config["project_id"]
+    config_hash = effective_config_hash(config, project_config)
+    if replaces is not None:
+        _replaceable_deployment(replaces, project_config["location"])
     
-    deployments[deployment_id] = {
+    record = {
         "id": deployment_id,
         "status": DeploymentStatus.PENDING,
+        "phase": None,
         "config": config,
+        "config_hash": config_hash,
+        "display_name": config["agent_name"],
+        "resource_name": None,
+        "location": project_config["location"],
         "start_time": time.time(),
         "result": None,
         "error": None,
+        "replaces": replaces,
+        "worker_pid": os.getpid(),
     }
     
-    import threading
-    thread = threading.Thread(
-        target=_deploy_worker,
-        args=(deployment_id, config),
-        daemon=True
-    )
-    thread.start()
+    existing = _find_reusable_deployment(config_hash) if DEPLOY_DEDUPE and replaces is None else None
+    if existing is not None:
+        print(f"[DEPLOY-{deployment_id[:8]}] Identical config already deployed as {existing['resource_name']}, reusing it")
+        count("deployment", action="reused")
+        deployment_store.put(deployment_id, dict(
+            record,
+            status=DeploymentStatus.COMPLETED,
+            resource_name=existing["resource_name"],
+            location=existing.get("location", record["location"]),
+            result=dict(existing["result"], deployment_action="reused", reused_from=existing["id"]),
+        ))
+        return deployment_id
+    
+    deployment_store.put(deployment_id, record)
+    
+    try:
+        deployment_scheduler.submit(deployment_id, project_id, _deploy_worker, deployment_id, config, replaces)
+    except Exception:
+        deployment_store.delete(deployment_id)
+        raise
     
     return deployment_id
 
-def _deploy_worker(deployment_id: str, config: dict):
+def cancel_deployment(deployment_id: str):
+    if deployment_id not in deployment_store:
+        return None
+    
+    state = deployment_scheduler.cancel(deployment_id)
+    if state == "pending":
+        _update_deployment(deployment_id, status=DeploymentStatus.CANCELLED, error="Cancelled before start")
+    return get_deployment_status(deployment_id)
+
+_DERIVED_RESULT_FIELDS = ("config", "system_message", "agent_code")
+
+def _compact_result(result: dict) -> dict:
+    """Drop result fields that can be regenerated from the deployment config."""
+    return {k: v for k, v in result.items() if k not in _DERIVED_RESULT_FIELDS}
+
+def _expand_result(result: dict, config: dict) -> dict:
+    return dict(
+        result,
+        config=config,
+        system_message=create_system_message(config),
+        agent_code=create_agent_code(config),
+    )
+
+def _load_deployment(deployment_id: str):
+    deployment = deployment_store.get(deployment_id)
+    if deployment is not None and deployment.get("result"):
+        deployment["result"] = _expand_result(deployment["result"], deployment["config"])
+    return deployment
+
+def _update_deployment(deployment_id: str, **changes):
+    if changes.get("result"):
+        changes["result"] = _compact_result(changes["result"])
+    deployment = deployment_store.update(deployment_id, **changes)
+    if deployment is not None:
+        deployment_events.publish(deployment_id, get_deployment_status(deployment_id))
+
+def recover_interrupted_deployments():
+    """Mark deployments left pending/in progress by a worker process that no longer exists."""
+    for deployment_id in deployment_store.list_ids(statuses=(DeploymentStatus.PENDING, DeploymentStatus.IN_PROGRESS)):
+        deployment = deployment_store.get(deployment_id)
+        pid = deployment.get("worker_pid") if deployment else None
+        if pid is None or pid == os.getpid() or _pid_alive(pid):
+            continue
+        print(f"[DEPLOY-{deployment_id[:8]}] Worker {pid} exited mid-deployment, marking as failed")
+        _update_deployment(deployment_id, status=DeploymentStatus.ERROR, error="Interrupted by server restart")
+
+def _pid_alive(pid: int) -> bool:
     try:
-        deployments[deployment_id]["status"] = DeploymentStatus.IN_PROGRESS
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+_phase_clocks = {}
+
+def _end_phase(deployment_id: str, outcome: str = "ok"):
+    clock = _phase_clocks.pop(deployment_id, None)
+    if clock is not None:
+        phase, started = clock
+        SPAN_SECONDS.observe(time.perf_counter() - started, stage=f"deploy.{phase}", outcome=outcome)
+
+def _enter_phase(deployment_id: str, phase: str, cancellable: bool = True):
+    if cancellable and deployment_scheduler.is_cancelled(deployment_id):
+        raise DeploymentCancelled()
+    _end_phase(deployment_id)
+    _phase_clocks[deployment_id] = (phase, time.perf_counter())
+    _update_deployment(deployment_id, phase=phase)
+
+def _engine_lease(resource_name: str) -> str:
+    return f"engine:{resource_name}"
+
+def _lease_replaced_engine(deployment_id: str, replaces: str, location: str) -> dict:
+    """Wait for exclusive use of the replaced deployment's engine, then re-check it.
+
+    Deployments replacing the same engine, in any worker process, run one at
+    a time; a later one fails if an earlier one already superseded its target.
+    """
+    resource_name = _replaceable_deployment(replaces, location)["resource_name"]
+    while not deployment_store.acquire_lease(_engine_lease(resource_name), deployment_id, ENGINE_LEASE_SECONDS):
+        if deployment_scheduler.is_cancelled(deployment_id):
+            raise DeploymentCancelled()
+        time.sleep(ENGINE_LEASE_POLL_SECONDS)
+    try:
+        return _replaceable_deployment(replaces, location)
+    except Exception:
+        deployment_store.release_lease(_engine_lease(resource_name), deployment_id)
+        raise
+
+def _supersede(resource_name: str, deployment_id: str):
+    # Every completed record served by this engine (the replaced one and any
+    # that reused it) now describes instructions the engine no longer has.
+    superseded = [
+        deployment["id"] for deployment in deployment_store.find("resource_name", resource_name, statuses=(DeploymentStatus.COMPLETED,))
+        if deployment["id"] != deployment_id
+    ]
+    for superseded_id in superseded:
+        _update_deployment(
+            superseded_id,
+            status=DeploymentStatus.SUPERSEDED,
+            superseded_by=deployment_id,
+            config_hash=None,
+            error=f"Replaced by deployment {deployment_id}",
+        )
+    test_response_cache.invalidate_where(lambda key: key[0] in superseded)
+
+def _retire_config_hash(resource_name: str):
+    # Records pointing at a resource whose contents changed (or that no longer
+    # exists) must not be offered for dedupe again.
+    for deployment in deployment_store.find("resource_name", resource_name):
+        deployment_store.update(deployment["id"], config_hash=None)
+
+def _update_engine(resource_name: str, langchain_agent, config: dict):
+    engine = get_reasoning_engine(resource_name)
+    with vertex_limiter.slot(ENGINE_ADMIN_QUOTA):
+        engine.update(
+            reasoning_engine=langchain_agent,
+            requirements=AGENT_REQUIREMENTS,
+            display_name=config["agent_name"],
+            description=config["description"],
+        )
+    invalidate_reasoning_engine(resource_name)
+    return engine
+
+def _deploy_worker(deployment_id: str, config: dict, replaces: str = None):
+    deploy_started = time.perf_counter()
+    previous = None
+    try:
+        _update_deployment(deployment_id, status=DeploymentStatus.IN_PROGRESS)
+        _enter_phase(deployment_id, DeploymentPhase.INITIALIZING)
         
         project_config = get_project_config()
         project_id = project_config["project_id"]
@@ -105,117 +398,316 @@ def _deploy_worker(deployment_id: str, config: dict):
         
         print(f"[DEPLOY-{deployment_id[:8]}] Starting deployment for: {config.get('agent_name')}")
         
-        credentials = get_credentials()
-        if credentials:
-            vertexai.init(
-                project=project_id,
-                location=location,
-                credentials=credentials,
-                staging_bucket=STAGING_BUCKET
-            )
-        else:
-            vertexai.init(
-                project=project_id,
-                location=location,
-                staging_bucket=STAGING_BUCKET
-            )
+        init_vertexai(project_id, location)
+        from vertexai.preview import reasoning_engines
         
         system_message = create_system_message(config)
         agent_code = create_agent_code(config)
         
+        _enter_phase(deployment_id, DeploymentPhase.BUILDING_AGENT)
         print(f"[DEPLOY-{deployment_id[:8]}] Creating LangChain agent...")
         langchain_agent = reasoning_engines.LangchainAgent(
-            model="gemini-2.0-flash",
-            model_kwargs={
-                "temperature": 0.7,
-                "max_output_tokens": 2048,
-            },
+            model=AGENT_MODEL,
+            model_kwargs=dict(AGENT_MODEL_KWARGS),
             runnable_kwargs={
                 "system_message": system_message
             }
         )
         
-        print(f"[DEPLOY-{deployment_id[:8]}] Submitting to Agent Engine...")
-        remote_agent = reasoning_engines.ReasoningEngine.create(
-            langchain_agent,
-            display_name=config["agent_name"],
-            description=config["description"],
-            requirements=[
-                "google-cloud-aiplatform[langchain,agent_engines]>=1.72.0",
-                "cloudpickle==3.0.0",
-                "langchain>=0.3.0,<0.4.0",
-                "langchain-google-vertexai>=2.0.0,<3.0.0",
-                "pydantic>=2.10",
-            ],
-        )
+        _enter_phase(deployment_id, DeploymentPhase.UPLOADING)
+        if replaces is not None:
+            previous = _lease_replaced_engine(deployment_id, replaces, location)
+        standby = engine_pool.claim() if previous is None and engine_pool.enabled else None
+        if previous is not None:
+            # Last point at which a cancel leaves the replaced engine untouched.
+            if deployment_scheduler.is_cancelled(deployment_id):
+                raise DeploymentCancelled()
+            print(f"[DEPLOY-{deployment_id[:8]}] Updating {previous['resource_name']} in place...")
+            remote_agent = _update_engine(previous["resource_name"], langchain_agent, config)
+            _supersede(previous["resource_name"], deployment_id)
+            deployment_action = "updated"
+            if deployment_scheduler.is_cancelled(deployment_id):
+                print(f"[DEPLOY-{deployment_id[:8]}] Cancel arrived after the engine was updated, completing instead")
+        elif standby is not None:
+            print(f"[DEPLOY-{deployment_id[:8]}] Claimed standby engine {standby}, updating...")
+            try:
+                remote_agent = _update_engine(standby, langchain_agent, config)
+            except Exception:
+                # The pool no longer tracks it, and its state after a failed update is unknown.
+                engine_pool.discard(standby)
+                raise
+            deployment_action = "claimed"
+        else:
+            print(f"[DEPLOY-{deployment_id[:8]}] Submitting to Agent Engine...")
+            with vertex_limiter.slot(ENGINE_ADMIN_QUOTA):
+                remote_agent = reasoning_engines.ReasoningEngine.create(
+                    langchain_agent,
+                    display_name=config["agent_name"],
+                    description=config["description"],
+                    requirements=AGENT_REQUIREMENTS,
+                )
+            deployment_action = "created"
         
         print(f"[DEPLOY-{deployment_id[:8]}] Deployment complete: {remote_agent.resource_name}")
         
+        if deployment_scheduler.is_cancelled(deployment_id) and deployment_action in ("created", "claimed"):
+            print(f"[DEPLOY-{deployment_id[:8]}] Cancelled during upload, deleting {remote_agent.resource_name}")
+            remote_agent.delete()
+            raise DeploymentCancelled()
+        
         resource_name = remote_agent.resource_name
-        base_url = f"https://{location}-aiplatform.googleapis.com/v1beta1"
+        base_url = f"{vertex_api_base_url(location)}/v1beta1"
         endpoint_url = f"{base_url}/{resource_name}:query"
         
+        # From here an engine exists and belongs to this deployment: a cancel
+        # arriving now (or after an in-place update) completes it rather than
+        # abandoning a live, billed engine.
+        _enter_phase(deployment_id, DeploymentPhase.VALIDATING, cancellable=False)
         endpoint_validated = False
         try:
-            test_response = remote_agent.query(input="Hello, are you ready?")
+            with vertex_limiter.slot(AGENT_MODEL):
+                # Timed inside the slot so limiter queueing is not counted as engine latency.
+                validate_started = time.perf_counter()
+                test_response = remote_agent.query(input="Hello, are you ready?")
             endpoint_validated = True
+            keep_warm.record_query(resource_name, time.perf_counter() - validate_started,
+                                   deployment_id=deployment_id, source="deploy")
         except Exception as e:
             print(f"[DEPLOY-{deployment_id[:8]}] Endpoint warmup needed: {e}")
         
-        deployments[deployment_id]["status"] = DeploymentStatus.COMPLETED
-        deployments[deployment_id]["result"] = {
-            "resource_name": resource_name,
-            "endpoint_url": endpoint_url,
-            "display_name": config["agent_name"],
-            "description": config["description"],
-            "agent_code": agent_code,
-            "deployment_type": "reasoning_engine",
-            "config": config,
-            "endpoint_validated": endpoint_validated,
-            "system_message": system_message,
-        }
+        _update_deployment(
+            deployment_id,
+            status=DeploymentStatus.COMPLETED,
+            resource_name=resource_name,
+            location=location,
+            result={
+                "resource_name": resource_name,
+                "endpoint_url": endpoint_url,
+                "location": location,
+                "display_name": config["agent_name"],
+                "description": config["description"],
+                "agent_code": agent_code,
+                "deployment_type": "reasoning_engine",
+                "config": config,
+                "endpoint_validated": endpoint_validated,
+                "system_message": system_message,
+                "deployment_action": deployment_action,
+            }
+        )
+        _end_phase(deployment_id)
+        count("deployment", action=deployment_action)
+        SPAN_SECONDS.observe(time.perf_counter() - deploy_started, stage="deploy.total", outcome="ok")
         
+    except DeploymentCancelled:
+        print(f"[DEPLOY-{deployment_id[:8]}] Deployment cancelled")
+        _end_phase(deployment_id, "cancelled")
+        _update_deployment(deployment_id, status=DeploymentStatus.CANCELLED, error="Cancelled")
     except Exception as e:
         print(f"[DEPLOY-{deployment_id[:8]}] Deployment failed: {e}")
-        deployments[deployment_id]["status"] = DeploymentStatus.ERROR
-        deployments[deployment_id]["error"] = str(e)
+        _end_phase(deployment_id, "error")
+        SPAN_SECONDS.observe(time.perf_counter() - deploy_started, stage="deploy.total", outcome="error")
+        _update_deployment(deployment_id, status=DeploymentStatus.ERROR, error=str(e))
+    finally:
+        if previous is not None:
+            deployment_store.release_lease(_engine_lease(previous["resource_name"]), deployment_id)
+
+def delete_deployment(deployment_id: str) -> bool:
+    deployment = _load_deployment(deployment_id)
+    if deployment is None:
+        return False
+    
+    if deployment["status"] in (DeploymentStatus.PENDING, DeploymentStatus.IN_PROGRESS):
+        raise ValueError("Deployment is still running; cancel it first")
+    
+    result = deployment.get("result") or {}
+    resource_name = result.get("resource_name")
+    # A superseded record's engine now belongs to the deployment that replaced it.
+    if resource_name and deployment["status"] != DeploymentStatus.SUPERSEDED:
+        get_reasoning_engine(resource_name).delete()
+        invalidate_reasoning_engine(resource_name)
+        keep_warm.forget(resource_name)
+        _retire_config_hash(resource_name)
+        for shared in deployment_store.find("resource_name", resource_name):
+            if shared["id"] != deployment_id:
+                deployment_store.update(shared["id"], status=DeploymentStatus.ERROR, error="Reasoning Engine was deleted")
+    if result.get("system_message"):
+        invalidate_system_instruction(result["system_message"])
+    
+    test_response_cache.invalidate_where(lambda key: key[0] == deployment_id)
+    deployment_store.delete(deployment_id)
+    return True
 
 def get_deployment_status(deployment_id: str) -> dict:
-    if deployment_id not in deployments:
+    """Status as polled by clients.
+
+    The result is the compact stored form; the config, system message and
+    agent code it was generated from are served by get_deployment_artifacts.
+    """
+    deployment = deployment_store.get(deployment_id)
+    if deployment is None:
         return None
     
-    deployment = deployments[deployment_id]
     elapsed = time.time() - deployment["start_time"]
     
     return {
         "id": deployment_id,
+        "version": deployment.get("version", 0),
         "status": deployment["status"],
+        "phase": deployment.get("phase"),
+        "queue_position": deployment_scheduler.position(deployment_id),
+        "start_time": deployment["start_time"],
         "elapsed_seconds": elapsed,
         "result": deployment["result"],
         "error": deployment["error"],
     }
 
-def test_agent(deployment_id: str, query: str) -> str:
-    if deployment_id not in deployments:
-        raise ValueError("Deployment not found")
+def status_etag(status: dict) -> str:
+    """Weak ETag that changes whenever the record or its queue position does.
+
+    Elapsed time is deliberately left out so polls during a deployment get
+    304s; `elapsed_seconds` is only refreshed on a 200, and clients that
+    show a running clock should derive it from `start_time`.
+    """
+    parts = [status["id"], status["version"], status["queue_position"]]
+    return 'W/"' + ":".join(str(part) for part in parts) + '"'
+
+def get_deployment_artifacts(deployment_id: str) -> dict:
+    deployment = deployment_store.get(deployment_id)
+    if deployment is None:
+        return None
     
-    deployment = deployments[deployment_id]
+    config = deployment["config"]
+    return {
+        "id": deployment_id,
+        "config": config,
+        "system_message": create_system_message(config),
+        "agent_code": create_agent_code(config),
+    }
+
+def get_completed_deployment(deployment_id: str) -> dict:
+    deployment = _load_deployment(deployment_id)
+    if deployment is None:
+        raise ValueError("Deployment not found")
     
+    if deployment["status"] == DeploymentStatus.SUPERSEDED:
+        raise ValueError(f"Deployment was replaced by {deployment.get('superseded_by')}")
     if deployment["status"] != DeploymentStatus.COMPLETED:
         raise ValueError("Deployment not complete")
     
-    result = deployment["result"]
-    config = result["config"]
+    return deployment["result"]
+
+def _publisher_model_url(method: str, model: str = TEST_MODEL, location: str = None) -> str:
+    project_config = get_project_config()
+    location = location or project_config["location"]
+    project_id = project_config["project_id"]
+    
+    return f"{vertex_api_base_url(location)}/v1/projects/{project_id}/locations/{location}/publishers/google/models/{model}:{method}"
+
+def _generate_content_payload(query: str, system_instruction: str, cached_content=None) -> dict:
+    payload = {
+        "contents": [{"role": "user", "parts": [{"text": query}]}],
+        "systemInstruction": {"parts": [{"text": system_instruction}]},
+        "generationConfig": {"temperature": 0.7, "maxOutputTokens": 2048}
+    }
+    if cached_content is not None:
+        del payload["systemInstruction"]
+        payload["cachedContent"] = cached_content.resource_name
+    return payload
+
+def _rest_request(method: str, query: str, system_instruction: str, location: str = None):
+    """URL and payload for the REST tier, referencing cached instructions when a cache exists.
+
+    Cached contents live in the vertexai.init location, so calls routed to
+    any other region send the instructions inline.
+    """
+    cached = None
+    if location in (None, get_project_config()["location"]):
+        cached = get_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+    model = CONTEXT_CACHE_MODEL if cached is not None else TEST_MODEL
+    payload = _generate_content_payload(query, system_instruction, cached)
+    return _publisher_model_url(method, model, location), payload, model, cached is not None
+
+def _candidate_text(data: dict):
+    candidates = data.get("candidates", [])
+    if candidates:
+        content = candidates[0].get("content", {})
+        parts = content.get("parts", [])
+        if parts:
+            return parts[0].get("text")
+    return None
+
+def _engine_chunk_text(chunk) -> str:
+    if isinstance(chunk, dict):
+        if "output" in chunk:
+            return str(chunk["output"])
+        messages = chunk.get("messages")
+        if messages:
+            last = messages[-1]
+            if isinstance(last, dict):
+                return str(last.get("kwargs", {}).get("content", last.get("content", "")))
+        return ""
+    return str(chunk)
+
+def _test_cache_key(deployment_id: str, query: str) -> tuple:
+    return (deployment_id, query, json.dumps(AGENT_MODEL_KWARGS, sort_keys=True))
+
+def _throttled(tier: str, error) -> RateLimitExceeded:
+    # Every later tier spends the same project quota, so falling back on a
+    # throttle would only multiply the load Vertex AI is pushing back on.
+    count("test_throttled", tier=tier)
+    print(f"{tier} throttled ({error}), not falling back")
+    return RateLimitExceeded(f"Vertex AI is throttling requests ({tier}): {error}")
+
+def test_agent(deployment_id: str, query: str) -> str:
+    """Answer `query` with the deployed agent."""
+    return answer_query(deployment_id, query)["response"]
+
+def answer_query(deployment_id: str, query: str) -> dict:
+    """Answer `query` with the deployed agent as {"response", "tier", "cached"}.
+    
+    `tier` is the fallback tier that produced the answer, or "error" when every
+    tier failed. A throttled tier raises RateLimitExceeded instead of falling
+    back. Identical concurrent calls share one upstream request when
+    TEST_COALESCE is set; with TEST_CACHE_ENABLED successful answers are also
+    reused for TEST_CACHE_TTL_SECONDS and reported with cached=True.
+    """
+    key = _test_cache_key(deployment_id, query)
+    if TEST_CACHE_ENABLED:
+        cached = test_response_cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+    
+    if TEST_COALESCE:
+        answer = test_flights.do(key, lambda: _query_agent(deployment_id, query))
+    else:
+        answer = _query_agent(deployment_id, query)
+    
+    if TEST_CACHE_ENABLED and answer["tier"] != "error":
+        test_response_cache.set(key, answer)
+    return dict(answer, cached=False)
+
+def _query_agent(deployment_id: str, query: str) -> dict:
+    result = get_completed_deployment(deployment_id)
     
     resource_name = result.get("resource_name")
     if resource_name:
         try:
-            engine = reasoning_engines.ReasoningEngine(resource_name)
-            response = engine.query(input=query)
+            engine = get_reasoning_engine(resource_name)
+            with vertex_limiter.slot(AGENT_MODEL), span("test.reasoning_engine"):
+                started = time.perf_counter()
+                response = engine.query(input=query)
+            keep_warm.record_query(resource_name, time.perf_counter() - started, deployment_id=deployment_id)
+            count("test_answer", tier="reasoning_engine")
             if isinstance(response, dict):
-                return response.get("output", str(response))
-            return str(response)
+                response = response.get("output", str(response))
+            return {"response": str(response), "tier": "reasoning_engine"}
+        except RateLimitExceeded:
+            raise
         except Exception as e:
+            if is_throttle_error(e):
+                raise _throttled("reasoning_engine", e) from e
+            count("test_fallback", from_tier="reasoning_engine")
+            invalidate_reasoning_engine(resource_name)
             print(f"ReasoningEngine query failed: {e}, using fallback")
     
     system_instruction = result.get("system_message", "")
@@ -223,43 +715,218 @@ def test_agent(deployment_id: str, query: str) -> str:
     endpoint_url = result.get("endpoint_url", "").replace(":query", ":generateContent").replace("v1beta1", "v1")
     
     if access_token and endpoint_url:
-        try:
-            project_config = get_project_config()
-            location = project_config["location"]
-            project_id = project_config["project_id"]
+        def generate(location):
+            api_endpoint, payload, model_name, used_cache = _rest_request("generateContent", query, system_instruction, location)
             
-            api_endpoint = f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}/locations/{location}/publishers/google/models/gemini-2.0-flash-exp:generateContent"
+            with vertex_limiter.slot(model_name) as slot, span("test.rest_api"):
+                response = post_json(api_endpoint, access_token, payload)
+                slot.record_status(response.status_code)
             
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            }
-            
-            payload = {
-                "contents": [{"role": "user", "parts": [{"text": query}]}],
-                "systemInstruction": {"parts": [{"text": system_instruction}]},
-                "generationConfig": {"temperature": 0.7, "maxOutputTokens": 2048}
-            }
-            
-            response = requests.post(api_endpoint, headers=headers, json=payload, timeout=60)
+            if response.status_code != 200 and used_cache:
+                invalidate_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+            if response.status_code in REGION_FAILURE_STATUSES:
+                raise RegionUnavailable(location, response.status_code)
+            return response, model_name
+        
+        try:
+            response, model_name = region_router.call(generate)
             
             if response.status_code == 200:
                 data = response.json()
-                candidates = data.get("candidates", [])
-                if candidates:
-                    content = candidates[0].get("content", {})
-                    parts = content.get("parts", [])
-                    if parts:
-                        return parts[0].get("text", "No response")
+                record_usage(model_name, data.get("usageMetadata"))
+                text = _candidate_text(data)
+                if text is not None:
+                    count("test_answer", tier="rest_api")
+                    return {"response": text, "tier": "rest_api"}
+            count("test_fallback", from_tier="rest_api")
+        except RateLimitExceeded:
+            raise
         except Exception as e:
+            if is_throttle_error(e):
+                raise _throttled("rest_api", e) from e
+            count("test_fallback", from_tier="rest_api")
             print(f"API fallback failed: {e}")
     
+    cached = get_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+    if cached is not None:
+        try:
+            with vertex_limiter.slot(CONTEXT_CACHE_MODEL), span("test.generative_model"):
+                response = get_cached_model(cached).generate_content(query)
+            record_usage(CONTEXT_CACHE_MODEL, getattr(response, "usage_metadata", None))
+            count("test_answer", tier="generative_model")
+            return {"response": response.text, "tier": "generative_model"}
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            if is_throttle_error(e):
+                raise _throttled("generative_model", e) from e
+            count("test_fallback", from_tier="generative_model_cached")
+            invalidate_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+            print(f"Cached-content query failed: {e}, sending instructions inline")
+    
+    def generate_inline(location):
+        model = get_generative_model(TEST_MODEL, system_instruction, location=location)
+        with vertex_limiter.slot(TEST_MODEL), span("test.generative_model"):
+            return model.generate_content(query)
+    
     try:
-        model = GenerativeModel(
-            "gemini-2.0-flash-exp",
-            system_instruction=system_instruction
-        )
-        response = model.generate_content(query)
-        return response.text
+        response = region_router.call(generate_inline)
+        record_usage(TEST_MODEL, getattr(response, "usage_metadata", None))
+        count("test_answer", tier="generative_model")
+        return {"response": response.text, "tier": "generative_model"}
+    except RateLimitExceeded:
+        raise
     except Exception as e:
-        return f"Error testing agent: {str(e)}"
+        if is_throttle_error(e):
+            raise _throttled("generative_model", e) from e
+        count("test_failure")
+        return {"response": f"{TEST_ERROR_PREFIX}{str(e)}", "tier": "error"}
+
+def stream_test_agent(deployment_id: str, query: str):
+    """Yield {"tier", "text"} chunks as the agent generates them.
+    
+    Tiers are tried in the same order as test_agent; a tier is only abandoned
+    for the next one if it fails before producing any output.
+    """
+    result = get_completed_deployment(deployment_id)
+    
+    resource_name = result.get("resource_name")
+    if resource_name:
+        started = False
+        try:
+            engine = get_reasoning_engine(resource_name)
+            with vertex_limiter.slot(AGENT_MODEL), span("test_stream.reasoning_engine"):
+                request_started = time.perf_counter()
+                for chunk in engine.stream_query(input=query):
+                    text = _engine_chunk_text(chunk)
+                    if text:
+                        if not started:
+                            keep_warm.record_query(resource_name, time.perf_counter() - request_started,
+                                                   deployment_id=deployment_id)
+                        started = True
+                        yield {"tier": "reasoning_engine", "text": text}
+            if started:
+                count("test_answer", tier="reasoning_engine")
+                return
+            count("test_fallback", from_tier="reasoning_engine")
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            if started:
+                raise
+            if is_throttle_error(e):
+                raise _throttled("reasoning_engine", e) from e
+            count("test_fallback", from_tier="reasoning_engine")
+            invalidate_reasoning_engine(resource_name)
+            print(f"ReasoningEngine stream_query failed: {e}, using fallback")
+    
+    system_instruction = result.get("system_message", "")
+    access_token = get_access_token()
+    
+    if access_token and result.get("endpoint_url"):
+        started = False
+        try:
+            # A region is only abandoned for the next one before it has produced output.
+            for location in region_router.attempts():
+                request_started = time.perf_counter()
+                api_endpoint, payload, model_name, used_cache = _rest_request(
+                    "streamGenerateContent", query, system_instruction, location)
+                api_endpoint += "?alt=sse"
+                
+                try:
+                    with vertex_limiter.slot(model_name) as slot, span("test_stream.rest_api"), \
+                            post_json(api_endpoint, access_token, payload, stream=True) as response:
+                        slot.record_status(response.status_code)
+                        if response.status_code == 200:
+                            for line in response.iter_lines(decode_unicode=True):
+                                if not line or not line.startswith("data:"):
+                                    continue
+                                data = json.loads(line[len("data:"):])
+                                record_usage(model_name, data.get("usageMetadata"))
+                                text = _candidate_text(data)
+                                if text:
+                                    started = True
+                                    yield {"tier": "rest_api", "text": text}
+                        elif used_cache:
+                            invalidate_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+                except RateLimitExceeded:
+                    raise
+                except Exception as e:
+                    if started or not is_region_failure(e):
+                        raise
+                    if is_throttle_error(e):
+                        raise _throttled("rest_api", e) from e
+                    region_router.record(location, time.perf_counter() - request_started, ok=False)
+                    continue
+                # Only a response that actually streamed is a healthy sample; client errors say nothing about the region.
+                if started:
+                    region_router.record(location, time.perf_counter() - request_started, ok=True)
+                    break
+                if response.status_code in THROTTLE_STATUSES:
+                    raise _throttled("rest_api", f"HTTP {response.status_code}")
+                if response.status_code in REGION_FAILURE_STATUSES:
+                    region_router.record(location, time.perf_counter() - request_started, ok=False)
+                    continue
+                break
+            if started:
+                count("test_answer", tier="rest_api")
+                return
+            count("test_fallback", from_tier="rest_api")
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            if started:
+                raise
+            count("test_fallback", from_tier="rest_api")
+            print(f"API stream fallback failed: {e}")
+    
+    cached = get_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+    if cached is not None:
+        started = False
+        try:
+            with vertex_limiter.slot(CONTEXT_CACHE_MODEL), span("test_stream.generative_model"):
+                for chunk in get_cached_model(cached).generate_content(query, stream=True):
+                    text = chunk.text
+                    if text:
+                        started = True
+                        yield {"tier": "generative_model", "text": text}
+            if started:
+                count("test_answer", tier="generative_model")
+                return
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            if started:
+                raise
+            if is_throttle_error(e):
+                raise _throttled("generative_model", e) from e
+            count("test_fallback", from_tier="generative_model_cached")
+            invalidate_cached_content(CONTEXT_CACHE_MODEL, system_instruction)
+            print(f"Cached-content stream failed: {e}, sending instructions inline")
+    
+    for location in region_router.attempts():
+        started = False
+        request_started = time.perf_counter()
+        try:
+            model = get_generative_model(TEST_MODEL, system_instruction, location=location)
+            with vertex_limiter.slot(TEST_MODEL), span("test_stream.generative_model"):
+                for chunk in model.generate_content(query, stream=True):
+                    text = chunk.text
+                    if text:
+                        started = True
+                        yield {"tier": "generative_model", "text": text}
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            if started or not is_region_failure(e):
+                raise
+            region_router.record(location, time.perf_counter() - request_started, ok=False)
+            if is_throttle_error(e):
+                raise _throttled("generative_model", e) from e
+            error = e
+            continue
+        region_router.record(location, time.perf_counter() - request_started, ok=True)
+        break
+    else:
+        raise error
+    count("test_answer", tier="generative_model")
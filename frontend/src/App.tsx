@@ -24,7 +24,7 @@ import ChatIcon from '@mui/icons-material/Chat';
 import { QueryClient, QueryClientProvider, useQuery, useMutation } from '@tanstack/react-query';
 import { theme, cvsColors } from './theme';
 import type { AgentConfig, DeploymentResult } from './types';
-import { parseRequirements, healthCheck } from './services/api';
+import { streamParseRequirements, healthCheck } from './services/api';
 import RequirementInput from './components/RequirementInput';
 import ConfigEditor from './components/ConfigEditor';
 import DeploymentPanel from './components/DeploymentPanel';
@@ -105,6 +105,7 @@ function ColorlibStepIcon(props: { active?: boolean; completed?: boolean; icon:
 
 function AppContent() {
   const [config, setConfig] = useState<AgentConfig | null>(null);
+  const [draftConfig, setDraftConfig] = useState<Partial<AgentConfig> | null>(null);
   const [deploymentResult, setDeploymentResult] = useState<DeploymentResult | null>(null);
   const [deploymentId, setDeploymentId] = useState<string | null>(null);
   const [activeStep, setActiveStep] = useState(0);
@@ -115,7 +116,12 @@ function AppContent() {
   });
 
   const parseMutation = useMutation({
-    mutationFn: parseRequirements,
+    mutationFn: (request: string) =>
+      streamParseRequirements(request, (field, value) => {
+        setDraftConfig((draft) => ({ ...draft, [field]: value }) as Partial<AgentConfig>);
+      }),
+    onMutate: () => setDraftConfig({}),
+    onSettled: () => setDraftConfig(null),
     onSuccess: (data) => {
       setConfig(data);
       setDeploymentResult(null);
@@ -290,6 +296,7 @@ function AppContent() {
           
           <ConfigEditor 
             config={config} 
+            draft={draftConfig}
             onConfigChange={handleConfigChange}
             isActive={activeStep === 1}
           />
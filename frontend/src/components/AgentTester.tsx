@@ -17,7 +17,7 @@ import SmartToyIcon from '@mui/icons-material/SmartToy';
 import PersonIcon from '@mui/icons-material/Person';
 import QuestionAnswerIcon from '@mui/icons-material/QuestionAnswer';
 import { useMutation } from '@tanstack/react-query';
-import { testAgent } from '../services/api';
+import { streamTestAgent } from '../services/api';
 import type { DeploymentResult } from '../types';
 import { cvsColors } from '../theme';
 
@@ -50,10 +50,33 @@ export default function AgentTester({ deploymentResult, deploymentId, isActive }
     scrollToBottom();
   }, [messages]);
 
+  const [isStreaming, setIsStreaming] = useState(false);
+
+  const appendAgentChunk = (text: string, isFirst: boolean) => {
+    setMessages((prev) => {
+      if (isFirst) {
+        return [...prev, { role: 'agent', content: text }];
+      }
+      const last = prev[prev.length - 1];
+      return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+    });
+  };
+
   const testMutation = useMutation({
-    mutationFn: (q: string) => testAgent(deploymentId!, q),
-    onSuccess: (response) => {
-      setMessages((prev) => [...prev, { role: 'agent', content: response }]);
+    mutationFn: async (q: string) => {
+      let started = false;
+      const response = await streamTestAgent(deploymentId!, q, (text) => {
+        const isFirst = !started;
+        started = true;
+        setIsStreaming(true);
+        appendAgentChunk(text, isFirst);
+      });
+      return { response, started };
+    },
+    onSuccess: ({ response, started }) => {
+      if (!started) {
+        setMessages((prev) => [...prev, { role: 'agent', content: response || 'No response' }]);
+      }
     },
     onError: (error: any) => {
       setMessages((prev) => [
@@ -61,6 +84,9 @@ export default function AgentTester({ deploymentResult, deploymentId, isActive }
         { role: 'agent', content: `Error: ${error.response?.data?.detail || error.message}` },
       ]);
     },
+    onSettled: () => {
+      setIsStreaming(false);
+    },
   });
 
   const handleSend = () => {
@@ -265,7 +291,7 @@ export default function AgentTester({ deploymentResult, deploymentId, isActive }
               </Box>
             ))}
             
-            {testMutation.isPending && (
+            {testMutation.isPending && !isStreaming && (
               <Box sx={{ display: 'flex', alignItems: 'center', gap: 1.5, mb: 2 }}>
                 <Avatar
                   sx={{
@@ -16,20 +16,25 @@ import { cvsColors } from '../theme';
 
 interface ConfigEditorProps {
   config: AgentConfig | null;
+  draft?: Partial<AgentConfig> | null;
   onConfigChange: (config: AgentConfig) => void;
   isActive: boolean;
 }
 
-export default function ConfigEditor({ config, onConfigChange, isActive }: ConfigEditorProps) {
+export default function ConfigEditor({ config, draft, onConfigChange, isActive }: ConfigEditorProps) {
   const [jsonText, setJsonText] = useState('');
   const [error, setError] = useState<string | null>(null);
 
+  // While a config is being generated, fields are shown read-only as they arrive.
+  const shown = draft ?? config;
+  const isDraft = !!draft;
+
   useEffect(() => {
-    if (config) {
-      setJsonText(JSON.stringify(config, null, 2));
+    if (shown) {
+      setJsonText(JSON.stringify(shown, null, 2));
       setError(null);
     }
-  }, [config]);
+  }, [shown]);
 
   const handleChange = (e: React.ChangeEvent<HTMLTextAreaElement>) => {
     const text = e.target.value;
@@ -44,7 +49,7 @@ export default function ConfigEditor({ config, onConfigChange, isActive }: Confi
     }
   };
 
-  if (!config) {
+  if (!shown) {
     return (
       <Paper 
         elevation={2} 
@@ -142,17 +147,30 @@ export default function ConfigEditor({ config, onConfigChange, isActive }: Confi
           </Box>
         </Box>
         
-        <Chip
-          icon={<CheckCircleOutlineIcon sx={{ fontSize: 16 }} />}
-          label="Ready to Deploy"
-          size="small"
-          sx={{
-            bgcolor: alpha('#10B981', 0.1),
-            color: '#059669',
-            fontWeight: 500,
-            border: `1px solid ${alpha('#10B981', 0.3)}`,
-          }}
-        />
+        {isDraft ? (
+          <Chip
+            label="Generating..."
+            size="small"
+            sx={{
+              bgcolor: alpha(cvsColors.lightBlue, 0.1),
+              color: cvsColors.darkBlue,
+              fontWeight: 500,
+              border: `1px solid ${alpha(cvsColors.lightBlue, 0.3)}`,
+            }}
+          />
+        ) : (
+          <Chip
+            icon={<CheckCircleOutlineIcon sx={{ fontSize: 16 }} />}
+            label="Ready to Deploy"
+            size="small"
+            sx={{
+              bgcolor: alpha('#10B981', 0.1),
+              color: '#059669',
+              fontWeight: 500,
+              border: `1px solid ${alpha('#10B981', 0.3)}`,
+            }}
+          />
+        )}
       </Box>
 
       {error && (
@@ -163,7 +181,7 @@ export default function ConfigEditor({ config, onConfigChange, isActive }: Confi
 
       <Box sx={{ mb: 2 }}>
         <Typography variant="caption" sx={{ color: cvsColors.gray[600], fontWeight: 600, textTransform: 'uppercase', letterSpacing: '0.5px' }}>
-          Agent: {config.agent_name}
+          Agent: {shown.agent_name ?? '...'}
         </Typography>
       </Box>
 
@@ -173,6 +191,7 @@ export default function ConfigEditor({ config, onConfigChange, isActive }: Confi
         rows={14}
         value={jsonText}
         onChange={handleChange}
+        InputProps={{ readOnly: isDraft }}
         variant="outlined"
         sx={{
           '& .MuiOutlinedInput-root': {
@@ -22,8 +22,8 @@ import ContentCopyIcon from '@mui/icons-material/ContentCopy';
 import CloudUploadIcon from '@mui/icons-material/CloudUpload';
 import CloudDoneIcon from '@mui/icons-material/CloudDone';
 import { useQuery } from '@tanstack/react-query';
-import { getDeploymentStatus, deployAgent } from '../services/api';
-import type { AgentConfig, DeploymentResult } from '../types';
+import { getDeploymentStatus, deployAgent, subscribeDeploymentStatus, cancelDeployment } from '../services/api';
+import type { AgentConfig, DeploymentResult, DeploymentStatus } from '../types';
 import { cvsColors } from '../theme';
 
 interface DeploymentPanelProps {
@@ -47,11 +47,21 @@ const deploymentSteps = [
   { label: 'Validating', description: 'Testing endpoint connectivity' },
 ];
 
+const phaseSteps: Record<NonNullable<DeploymentStatus['phase']>, number> = {
+  initializing: 0,
+  building_agent: 1,
+  uploading: 2,
+  validating: 3,
+};
+
 export default function DeploymentPanel({ config, onDeploymentStart, onDeploymentError, onDeploymentComplete, isActive }: DeploymentPanelProps) {
   const [deploymentId, setDeploymentId] = useState<string | null>(null);
   const [isDeploying, setIsDeploying] = useState(false);
   const [deploymentResult, setDeploymentResult] = useState<DeploymentResult | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [pushedStatus, setPushedStatus] = useState<DeploymentStatus | null>(null);
+  const [usePolling, setUsePolling] = useState(false);
+  const [now, setNow] = useState(() => Date.now() / 1000);
 
   const configKey = config ? JSON.stringify(config) : null;
   
@@ -60,22 +70,39 @@ export default function DeploymentPanel({ config, onDeploymentStart, onDeploymen
     setIsDeploying(false);
     setDeploymentResult(null);
     setError(null);
+    setPushedStatus(null);
+    setUsePolling(false);
   }, [configKey]);
 
-  const { data: status } = useQuery({
+  useEffect(() => {
+    if (!deploymentId || !isDeploying) return;
+    return subscribeDeploymentStatus(deploymentId, setPushedStatus, () => setUsePolling(true));
+  }, [deploymentId, isDeploying]);
+
+  // A 304 from the status endpoint keeps the old elapsed_seconds, so tick locally from start_time.
+  useEffect(() => {
+    if (!isDeploying) return;
+    const timer = setInterval(() => setNow(Date.now() / 1000), 1000);
+    return () => clearInterval(timer);
+  }, [isDeploying]);
+
+  // Polling is only a fallback for when the event stream cannot be used.
+  const { data: polledStatus } = useQuery({
     queryKey: ['deploymentStatus', deploymentId],
     queryFn: () => getDeploymentStatus(deploymentId!),
-    enabled: !!deploymentId && isDeploying,
+    enabled: !!deploymentId && isDeploying && usePolling,
     refetchInterval: 3000,
   });
 
+  const status = (usePolling && polledStatus) || pushedStatus;
+
   useEffect(() => {
     if (status) {
       if (status.status === 'completed' && status.result) {
         setIsDeploying(false);
         setDeploymentResult(status.result);
         onDeploymentComplete(status.result, deploymentId!);
-      } else if (status.status === 'error') {
+      } else if (status.status === 'error' || status.status === 'cancelled' || status.status === 'superseded') {
         setIsDeploying(false);
         setError(status.error || 'Deployment failed');
         onDeploymentError();
@@ -89,6 +116,8 @@ export default function DeploymentPanel({ config, onDeploymentStart, onDeploymen
     setError(null);
     setIsDeploying(true);
     setDeploymentResult(null);
+    setPushedStatus(null);
+    setUsePolling(false);
     onDeploymentStart();
     
     try {
@@ -101,11 +130,25 @@ export default function DeploymentPanel({ config, onDeploymentStart, onDeploymen
     }
   };
 
+  const handleCancel = async () => {
+    if (!deploymentId) return;
+    try {
+      setPushedStatus(await cancelDeployment(deploymentId));
+    } catch (err: any) {
+      setError(err.response?.data?.detail || err.message || 'Failed to cancel deployment');
+    }
+  };
+
+  const elapsedSeconds = status?.start_time ? Math.max(0, now - status.start_time) : status?.elapsed_seconds ?? 0;
+
   const getActiveStep = (): number => {
     if (!status) return 0;
     if (status.status === 'pending') return 0;
     if (status.status === 'in_progress') {
-      const elapsed = status.elapsed_seconds;
+      if (status.phase) {
+        return phaseSteps[status.phase];
+      }
+      const elapsed = elapsedSeconds;
       if (elapsed < 30) return 0;
       if (elapsed < 120) return 1;
       if (elapsed < 300) return 2;
@@ -308,8 +351,16 @@ export default function DeploymentPanel({ config, onDeploymentStart, onDeploymen
           />
           
           <Typography variant="body2" color="text.secondary" sx={{ textAlign: 'center' }}>
-            Elapsed: {status ? formatTime(status.elapsed_seconds) : '0m 0s'} • This typically takes 5-10 minutes
+            {status?.queue_position
+              ? `Queued • Position ${status.queue_position} in line`
+              : `Elapsed: ${status ? formatTime(elapsedSeconds) : '0m 0s'} • This typically takes 5-10 minutes`}
           </Typography>
+
+          <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+            <Button size="small" variant="outlined" onClick={handleCancel} disabled={!deploymentId}>
+              Cancel Deployment
+            </Button>
+          </Box>
         </Box>
       )}
 
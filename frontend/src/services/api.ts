@@ -25,17 +25,142 @@ export const parseRequirements = async (userRequest: string): Promise<AgentConfi
   return response.data.config;
 };
 
-export const deployAgent = async (config: AgentConfig): Promise<string> => {
-  const response = await api.post('/deploy', { config });
+export const deployAgent = async (config: AgentConfig, replaces?: string): Promise<string> => {
+  const response = await api.post('/deploy', replaces ? { config, replaces } : { config });
   return response.data.deployment_id;
 };
 
+export const cancelDeployment = async (deploymentId: string): Promise<DeploymentStatus> => {
+  const response = await api.post(`/deploy/${deploymentId}/cancel`);
+  return response.data;
+};
+
 export const getDeploymentStatus = async (deploymentId: string): Promise<DeploymentStatus> => {
   const response = await api.get(`/status/${deploymentId}`);
   return response.data;
 };
 
+export const subscribeDeploymentStatus = (
+  deploymentId: string,
+  onStatus: (status: DeploymentStatus) => void,
+  onUnavailable: () => void,
+): (() => void) => {
+  if (typeof EventSource === 'undefined') {
+    onUnavailable();
+    return () => {};
+  }
+
+  const source = new EventSource(`${API_BASE}/status/${deploymentId}/events`);
+  source.onmessage = (event) => {
+    const status: DeploymentStatus = JSON.parse(event.data);
+    onStatus(status);
+    if (status.status === 'completed' || status.status === 'error' || status.status === 'cancelled' || status.status === 'superseded') {
+      source.close();
+    }
+  };
+  source.onerror = () => {
+    source.close();
+    onUnavailable();
+  };
+
+  return () => source.close();
+};
+
 export const testAgent = async (deploymentId: string, query: string): Promise<string> => {
   const response = await api.post('/test', { deployment_id: deploymentId, query });
   return response.data.response;
 };
+
+interface SseEvent {
+  event: string;
+  data: any;
+}
+
+const parseSseEvent = (raw: string): SseEvent | null => {
+  let event = 'message';
+  const dataLines: string[] = [];
+  for (const line of raw.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+  if (dataLines.length === 0) return null;
+  return { event, data: JSON.parse(dataLines.join('\n')) };
+};
+
+const postEventStream = async (
+  path: string,
+  body: unknown,
+  onEvent: (event: SseEvent) => void,
+): Promise<void> => {
+  const response = await fetch(`${API_BASE}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => ({}));
+    throw new Error(data.detail || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const rawEvents = buffer.split('\n\n');
+    buffer = rawEvents.pop() ?? '';
+
+    for (const raw of rawEvents) {
+      const event = parseSseEvent(raw);
+      if (!event) continue;
+      if (event.event === 'throttled') {
+        throw new Error(event.data.detail || 'Rate limited, please retry shortly');
+      }
+      if (event.event === 'error') {
+        throw new Error(event.data.detail || 'Streaming failed');
+      }
+      onEvent(event);
+    }
+  }
+};
+
+export const streamTestAgent = async (
+  deploymentId: string,
+  query: string,
+  onChunk: (text: string) => void,
+): Promise<string> => {
+  let fullText = '';
+  await postEventStream('/test/stream', { deployment_id: deploymentId, query }, (event) => {
+    if (event.event === 'message' && event.data.text) {
+      fullText += event.data.text;
+      onChunk(event.data.text);
+    }
+  });
+  return fullText;
+};
+
+export const streamParseRequirements = async (
+  userRequest: string,
+  onField: (field: keyof AgentConfig, value: unknown) => void,
+): Promise<AgentConfig> => {
+  let config: AgentConfig | null = null;
+  await postEventStream('/parse/stream', { user_request: userRequest }, (event) => {
+    if (event.event === 'message' && event.data.field) {
+      onField(event.data.field, event.data.value);
+    } else if (event.event === 'done') {
+      config = event.data.config;
+    }
+  });
+  if (!config) {
+    throw new Error('Parsing ended without a configuration');
+  }
+  return config;
+};
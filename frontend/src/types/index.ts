@@ -18,11 +18,16 @@ export interface DeploymentResult {
   config?: AgentConfig;
   endpoint_validated?: boolean;
   system_message?: string;
+  deployment_action?: 'created' | 'updated' | 'reused' | 'claimed';
+  reused_from?: string;
 }
 
 export interface DeploymentStatus {
   id: string;
-  status: 'pending' | 'in_progress' | 'completed' | 'error';
+  status: 'pending' | 'in_progress' | 'completed' | 'error' | 'cancelled' | 'superseded';
+  phase?: 'initializing' | 'building_agent' | 'uploading' | 'validating' | null;
+  queue_position?: number | null;
+  start_time?: number | null;
   elapsed_seconds: number;
   result?: DeploymentResult;
   error?: string;